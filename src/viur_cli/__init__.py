@@ -1,12 +1,27 @@
 from .cli import *
-from .conf import *
-from .package import *
-from .local import *
-from .build import *
-from .setup import *
 from .version import *
-from .tool import *
-from .update import *
-from .cloud import *
-from .deprecated import *
-from .scriptor import script
+
+_COMMAND_MODULES = (".package", ".local", ".build", ".setup", ".tool", ".update", ".cloud", ".deprecated", ".scriptor")
+"""
+Command modules which are imported on demand by the `cli` group; see `cli.LAZY_COMMANDS`.
+"""
+
+
+def __getattr__(name):
+    """
+    Resolves the public names of the command modules, which used to be star-imported here, on first access.
+    """
+    import importlib
+    import importlib.util
+
+    # Submodules requested by "from . import name" are imported as usual
+    if importlib.util.find_spec(f"{__name__}.{name}"):
+        return importlib.import_module(f"{__name__}.{name}")
+
+    if not name.startswith("_"):
+        for module_name in _COMMAND_MODULES:
+            module = importlib.import_module(module_name, __name__)
+            if hasattr(module, name):
+                return getattr(module, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,328 @@
+"""
+Optimization of the static assets in build outputs, enabled by "optimize" in a build configuration.
+
+After a build, its "target" folder is post-processed in parallel across files:
+
+- Assets without a content hash in their file name can be fingerprinted: they are renamed to contain a hash of their
+  content, and references to them in the other text assets of the folder are rewritten.
+- Text assets are precompressed into .gz and, with the optional brotli package installed, .br siblings.
+
+Afterwards, handlers serving all fingerprinted files, including those already fingerprinted by the bundler, with a long
+cache lifetime can be written into the app.yaml of the distribution folder.
+"""
+
+import concurrent.futures
+import gzip
+import hashlib
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULTS = {
+    "compress": ["gzip", "br"],
+    "fingerprint": False,
+    "expiration": "365d",
+    "min_size": 1024,
+}
+"""
+Options of "optimize" in a build configuration; "optimize": true uses them as they are.
+"""
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".css", ".eot", ".htm", ".html", ".ico", ".js", ".json", ".map", ".mjs", ".otf", ".svg", ".ttf", ".txt",
+    ".wasm", ".webmanifest", ".xml",
+}
+"""
+Extensions of files which are precompressed; images and woff fonts are compressed already.
+"""
+
+TEXT_EXTENSIONS = {".css", ".htm", ".html", ".js", ".json", ".mjs", ".svg", ".webmanifest"}
+"""
+Extensions of files in which references to fingerprinted files are rewritten.
+"""
+
+FIXED_NAMES = {"favicon.ico", "manifest.json", "robots.txt", "service-worker.js", "sw.js"}
+"""
+File names which are requested by their name and are never fingerprinted, besides HTML pages and source maps.
+"""
+
+COMPRESSED_EXTENSIONS = {".gz": "gzip", ".br": "br"}
+
+FINGERPRINTED = re.compile(r"[.-](?=[0-9]*[a-f])[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+"""
+Matches file names containing a hexadecimal content hash of at least 8 characters, e.g. "index.4f3a9c1b.js" from a
+bundler or "logo.2c26b46b68.png" from `fingerprint()`. Names like "hero-1920x1080.png" or dates don't count;
+hashes consisting of digits only are left out as well, so such files just don't get a long cache lifetime.
+"""
+
+HANDLERS_BEGIN = "# viur-cli: optimized assets begin"
+HANDLERS_END = "# viur-cli: optimized assets end"
+"""
+Markers in the handlers of app.yaml, between which the generated handlers are written.
+"""
+
+HANDLERS_FILE = "optimized-handlers.yaml"
+"""
+File next to app.yaml, to which the handlers are written when app.yaml doesn't contain the markers.
+"""
+
+
+def settings(build_cfg):
+    """
+    Returns the optimization options of a build configuration, or None when it isn't optimized.
+    """
+    if not (optimize := build_cfg.get("optimize")):
+        return None
+
+    return DEFAULTS | (optimize if isinstance(optimize, dict) else {})
+
+
+def is_fingerprinted(name):
+    name, extension = os.path.splitext(name)
+    if extension not in COMPRESSED_EXTENSIONS:
+        name += extension
+
+    return bool(FINGERPRINTED.search(name))
+
+
+def _files(folder):
+    """
+    Returns the paths of all files below folder, relative to it, except precompressed ones.
+    """
+    return [
+        os.path.relpath(os.path.join(parent, name), folder)
+        for parent, _, files in os.walk(folder) for name in files
+        if os.path.splitext(name)[1] not in COMPRESSED_EXTENSIONS
+    ]
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write(path, data):
+    # A new file, so that hardlinks to the previous one, e.g. in the artifact cache, stay untouched
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+
+    os.replace(tmp_path, path)
+
+
+def fingerprint(folder, pool):
+    """
+    Renames the assets below folder to contain a hash of their content, and rewrites references to them.
+
+    Text assets may reference other assets, so their hash covers the contents of all renamed assets; any change
+    renames all of them. References are matched by file name, so only assets with a unique name are renamed.
+
+    :return: The number of renamed files.
+    """
+    files = _files(folder)
+    basenames = [os.path.basename(path) for path in files]
+
+    candidates = [
+        path for path, name in zip(files, basenames)
+        if basenames.count(name) == 1
+        and name not in FIXED_NAMES
+        and os.path.splitext(name)[1] not in {".htm", ".html", ".map"}
+        and not is_fingerprinted(name)
+    ]
+
+    if not candidates:
+        return 0
+
+    digests = dict(zip(
+        candidates,
+        pool.map(lambda path: hashlib.sha256(_read(os.path.join(folder, path))).hexdigest(), candidates)
+    ))
+    combined = hashlib.sha256("".join(digests[path] for path in sorted(candidates)).encode()).hexdigest()
+
+    renames = {}
+    for path in candidates:
+        stem, extension = os.path.splitext(os.path.basename(path))
+        digest = hashlib.sha256(f"{digests[path]}{combined}".encode()).hexdigest() \
+            if extension in TEXT_EXTENSIONS else digests[path]
+        renames[os.path.basename(path)] = f"{stem}.{digest[:10]}{extension}"
+
+    # A file name, neither part of a longer name nor followed by a further extension, like "app.js" in "app.js.map"
+    pattern = re.compile(
+        rb"(?<![\w.-])(" + b"|".join(re.escape(name.encode()) for name in renames) + rb")(?![\w-]|\.\w)"
+    )
+
+    def rewrite(path):
+        path = os.path.join(folder, path)
+        data = _read(path)
+        rewritten = pattern.sub(lambda match: renames[match.group(1).decode()].encode(), data)
+
+        if rewritten != data:
+            _write(path, rewritten)
+
+    list(pool.map(rewrite, [path for path in files if os.path.splitext(path)[1] in TEXT_EXTENSIONS]))
+
+    for path in candidates:
+        os.replace(
+            os.path.join(folder, path),
+            os.path.join(folder, os.path.dirname(path), renames[os.path.basename(path)])
+        )
+
+    return len(candidates)
+
+
+def compress(folder, algorithms, min_size, pool):
+    """
+    Writes precompressed siblings of the text assets below folder, when they are smaller than the original,
+    and removes siblings of files which don't exist anymore.
+
+    :return: The number of written files.
+    """
+    compressors = {
+        "gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+        "br": brotli and (lambda data: brotli.compress(data, quality=11)),
+    }
+    compressors = {algorithm: compressors[algorithm] for algorithm in algorithms if compressors.get(algorithm)}
+
+    for parent, _, names in os.walk(folder):
+        for name in names:
+            original, extension = os.path.splitext(name)
+            if (extension in COMPRESSED_EXTENSIONS and os.path.splitext(original)[1] in COMPRESSIBLE_EXTENSIONS
+                    and not os.path.exists(os.path.join(parent, original))):
+                os.unlink(os.path.join(parent, name))
+
+    def compress_file(path):
+        path = os.path.join(folder, path)
+        data = _read(path)
+        written = 0
+
+        for extension, algorithm in COMPRESSED_EXTENSIONS.items():
+            if algorithm not in compressors:
+                continue
+
+            if len(compressed := compressors[algorithm](data)) < len(data):
+                _write(path + extension, compressed)
+                written += 1
+
+            elif os.path.exists(path + extension):
+                os.unlink(path + extension)
+
+        return written
+
+    return sum(pool.map(compress_file, [
+        path for path in _files(folder)
+        if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS
+        and os.path.getsize(os.path.join(folder, path)) >= min_size
+    ]))
+
+
+def optimize(folder, options):
+    """
+    Optimizes the assets below folder as configured by options, see `settings()`.
+
+    :return: A dict with the number of "fingerprinted" and "compressed" files.
+    """
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        return {
+            "fingerprinted": fingerprint(folder, pool) if options["fingerprint"] else 0,
+            "compressed": compress(folder, options["compress"], options["min_size"], pool),
+        }
+
+
+def expiration_seconds(expiration):
+    """
+    Converts an app.yaml expiration like "365d" or "4d 5h" into seconds.
+    """
+    units = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+    return sum(int(value) * units[unit] for value, unit in re.findall(r"(\d+)([dhms])", expiration))
+
+
+def handlers(app_yaml, folders):
+    """
+    Returns app.yaml handlers serving the fingerprinted files below the given folders with a long cache lifetime.
+
+    The URLs of a folder are taken from the "static_dir" handler of app.yaml which serves it; folders without one are
+    left out. Handlers are created per directory, matching all of its files when all of them are fingerprinted.
+
+    :param app_yaml: Path of app.yaml.
+    :param folders: A dict of folders to their optimization options.
+    """
+    import yaml
+
+    root = os.path.dirname(app_yaml)
+
+    try:
+        with open(app_yaml) as f:
+            static_dirs = [
+                handler for handler in (yaml.safe_load(f) or {}).get("handlers") or ()
+                if isinstance(handler, dict) and "static_dir" in handler
+            ]
+    except yaml.YAMLError as e:
+        raise ValueError(str(e)) from e
+
+    result = []
+
+    for folder, options in folders.items():
+        target = os.path.relpath(folder, root)
+
+        if not (static_dir := next((
+            handler for handler in static_dirs
+            if os.path.commonpath((os.path.normpath(handler["static_dir"]), target))
+            == os.path.normpath(handler["static_dir"])
+        ), None)):
+            continue
+
+        url = f"""{static_dir["url"].rstrip("/")}/{os.path.relpath(target, static_dir["static_dir"])}"""
+        url = url.removesuffix("/.")
+        headers = {"Cache-Control": f"""public, max-age={expiration_seconds(options["expiration"])}, immutable"""}
+
+        for parent, _, files in sorted(os.walk(folder)):
+            files = sorted(name for name in files if os.path.splitext(name)[1] not in COMPRESSED_EXTENSIONS)
+            if not (fingerprinted := [name for name in files if is_fingerprinted(name)]):
+                continue
+
+            directory = os.path.relpath(parent, folder).replace(os.sep, "/").removeprefix(".")
+            names = "[^/]+" if fingerprinted == files else "|".join(re.escape(name) for name in fingerprinted)
+            path = "/".join(part for part in (target.replace(os.sep, "/"), directory) if part)
+
+            result.append({
+                "url": "/".join(part for part in (url, directory) if part) + f"/({names})",
+                "static_files": f"{path}/\\1",
+                "upload": f"{path}/({names})",
+                "expiration": options["expiration"],
+                "http_headers": dict(headers),
+            } | ({"secure": static_dir["secure"]} if "secure" in static_dir else {}))
+
+    return result
+
+
+def write_handlers(app_yaml, handlers):
+    """
+    Writes handlers between the markers in app.yaml, or into a separate file next to it when they are missing.
+
+    :return: The path of the written file.
+    """
+    import yaml
+
+    with open(app_yaml) as f:
+        content = f.read()
+
+    begin, end = content.find(HANDLERS_BEGIN), content.find(HANDLERS_END)
+
+    if begin < 0 or end < begin:
+        path = os.path.join(os.path.dirname(app_yaml), HANDLERS_FILE)
+        with open(path, "w") as f:
+            yaml.safe_dump({"handlers": handlers}, f, sort_keys=False)
+
+        return path
+
+    indent = content[content.rfind("\n", 0, begin) + 1:begin]
+    block = yaml.safe_dump(handlers, sort_keys=False, width=1000) if handlers else ""
+    block = "".join(f"{indent}{line}\n" for line in block.splitlines())
+
+    content = content[:content.index("\n", begin) + 1] + block + indent + content[end:]
+    _write(app_yaml, content.encode())
+    return app_yaml
@@ -0,0 +1,116 @@
+"""
+Runs a list of viur commands in a single process, sharing the loaded project configuration.
+"""
+
+import click
+import shlex
+import sys
+import time
+from . import cli, utils
+from .conf import config, scriptor_config
+
+
+def parse_batch(lines):
+    """
+    Parses the lines of a batch file into argument lists.
+
+    Empty lines and lines starting with # are ignored, a leading "viur" is optional.
+    """
+    steps = []
+
+    for line in lines:
+        if not (line := line.strip()) or line.startswith("#"):
+            continue
+
+        args = shlex.split(line)
+        if args[0] == "viur":
+            args = args[1:]
+
+        if args and args[0] == "batch":
+            utils.echo_fatal("A batch can't run another batch")
+
+        if args:
+            steps.append(args)
+
+    return steps
+
+
+def run_step(args):
+    """
+    Runs a single viur invocation in this process and returns its exit code.
+    """
+    try:
+        ret = cli.main(args=args, prog_name="viur", standalone_mode=False)
+        return ret if isinstance(ret, int) else 0
+
+    except click.ClickException as e:
+        e.show()
+        return e.exit_code
+
+    except click.Abort:
+        utils.echo_error("Aborted!")
+        return 1
+
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+
+        utils.echo_error(str(e.code))
+        return 1
+
+
+def print_timings(timings):
+    """
+    Prints a table of the executed steps with their exit codes and durations.
+    """
+    width = max(len(command) for command, _, _ in timings)
+
+    click.echo(f"\n{'command':<{width}}  {'status':>6}  {'seconds':>8}")
+    for command, exit_code, duration in timings:
+        status = click.style(f"{'ok' if exit_code == 0 else exit_code:>6}", fg="green" if exit_code == 0 else "red")
+        click.echo(f"{command:<{width}}  {status}  {duration:>8.2f}")
+
+    click.echo(f"{'total':<{width}}  {'':>6}  {sum(duration for _, _, duration in timings):>8.2f}")
+
+
+@cli.command()
+@click.argument("file", type=click.File("r"), default="-")
+def batch(file):
+    """
+    Run several viur commands in one process.
+
+    Reads one viur invocation per line from FILE, or from stdin when FILE is omitted or "-", e.g.:
+
+    \b
+        build release
+        update requirements
+        cloud deploy app default -y
+
+    All steps share the once loaded and migrated project.json and the one-time checks of viur.
+    The batch stops at the first failing step and finally prints a timing table of all executed steps.
+    """
+    steps = parse_batch(file)
+    timings = []
+
+    for args in steps:
+        command = shlex.join(args)
+        utils.echo_info(f"--- viur {command}")
+
+        start = time.monotonic()
+        exit_code = run_step(args)
+        timings.append((command, exit_code, time.monotonic() - start))
+
+        # Later steps may start viur child processes, which must read what this step changed
+        for lazy_config in (config, scriptor_config):
+            if lazy_config.loaded:
+                lazy_config.flush()
+
+        if exit_code:
+            break
+
+    if timings:
+        print_timings(timings)
+
+    if timings and (exit_code := timings[-1][1]):
+        utils.echo_error(f"Batch stopped after {len(timings)} of {len(steps)} steps")
+        sys.exit(exit_code)
@@ -2,10 +2,20 @@
 Performs build steps configured within the project, or creates any necessary steps for a project deployment build.
 """
 
+import asyncio
 import click
+import contextlib
 import os
+import shlex
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+import typing
 from .conf import config
-from . import cli, utils
+from . import assets, buildcache, buildhistory, cli, executor, logs, utils
+from .tracing import span
 
 
 def _build(conf, name, build_cfg, additional_args):
@@ -13,8 +23,9 @@ def _build(conf, name, build_cfg, additional_args):
     Internal function to perform steps required for a given build configuration.
 
     This internal function is responsible for building an application according to the specified build configuration.
-    It can handle two types of builds:
+    It can handle three types of builds:
         - npm: For building Node.js applications using npm package manager.
+        - pnpm: Like npm, but installing the packages through a store shared by all builds of the project.
         - exec: For executing custom commands specified in the build configuration.
 
     :param conf: dict
@@ -42,32 +53,353 @@ def _build(conf, name, build_cfg, additional_args):
     """
 
     utils.echo_info(f"""- {build_cfg["kind"]} {name}""")
+    if output := buildcache.output_path(conf, build_cfg):
+        buildcache.detach(output)
+
+    with span(f"build {name}", "build", kind=build_cfg["kind"]):
+        for step in _build_steps(conf, name, build_cfg, capture=False):
+            utils.system(step.process.command, cwd=step.process.cwd)
+            if step.on_success:
+                step.on_success()
+
+    if output and (options := assets.settings(build_cfg)):
+        _optimize(name, output, options)
+
+
+class _BuildStep(typing.NamedTuple):
+    process: executor.Process
+    phase: str
+    """
+    "install" or "build"
+    """
+
+    on_success: typing.Callable[[], None] = None
+    """
+    Called after the process succeeded.
+    """
+
+
+def _build_steps(conf, name, build_cfg, capture=True):
+    """
+    Returns the steps, to be run one after another, which build the given build configuration.
+    """
     match build_cfg["kind"]:
-        case "npm":
-            utils.system(
-                " && ".join(
-                    (
-                        f'cd {os.path.join(conf["sources_folder"], build_cfg["source"])}',
-                        "npm install",
-                        f'npm run {build_cfg["command"]}'
-                    )
-                )
-            )
+        case "npm" | "pnpm" as kind:
+            source = os.path.join(conf["sources_folder"], build_cfg["source"])
+            steps = []
+
+            if install := _npm_install(source, name, capture, kind):
+                steps.append(install)
+
+            steps.append(_BuildStep(
+                executor.Process(f'{kind} run {build_cfg["command"]}', name=name, cwd=source, capture=capture), "build"
+            ))
+            return steps
 
         case "exec":
-            utils.system(build_cfg["command"])
+            return [_BuildStep(executor.Process(build_cfg["command"], name=name, capture=capture), "build")]
 
         case other:
             utils.echo_fatal(f"Unknown build kind {other!r}")
 
 
+def _npm_install(source, name, capture=True, kind="npm"):
+    """
+    Returns the step installing the npm dependencies of a source folder, or None when node_modules are up-to-date.
+
+    With a package-lock.json, `npm ci` installs exactly the locked versions without modifying the lockfile.
+    Downloaded packages are kept in a cache shared by all projects.
+
+    For the "pnpm" kind, packages are installed into the content-addressable store shared by all builds of the
+    project, and hardlinked from there into node_modules; a pnpm-lock.yaml is never modified.
+    """
+    stamp = buildcache.install_stamp(source, kind)
+    if buildcache.is_installed(source, stamp):
+        utils.echo_info(f"  - {name}: {kind} dependencies are up-to-date")
+        return None
+
+    if kind == "pnpm":
+        frozen = os.path.exists(os.path.join(source, "pnpm-lock.yaml"))
+        command = (
+            f"pnpm install {'--frozen-lockfile ' if frozen else ''}"
+            f"--store-dir {shlex.quote(os.path.abspath(buildcache.PNPM_STORE_FOLDER))} --prefer-offline"
+        )
+    else:
+        command = "ci" if os.path.exists(os.path.join(source, "package-lock.json")) else "install"
+        command = f"npm {command} --cache {shlex.quote(utils.cache_dir('npm'))} --prefer-offline --no-audit --no-fund"
+
+    process = executor.Process(command, name=name, cwd=source, capture=capture)
+
+    # Fingerprinted after installing, as an install without a lockfile creates one
+    return _BuildStep(
+        process, "install", lambda: buildcache.mark_installed(source, buildcache.install_stamp(source, kind))
+    )
+
+
+def _optimize(name, output, options):
+    """
+    Optimizes the static assets in the output folder of a build, see `assets`.
+    """
+    if not os.path.isdir(output):
+        utils.echo_warning(f"{name}: can't optimize the missing {output}")
+        return
+
+    if "br" in options["compress"] and not assets.brotli:
+        utils.echo_warning(f"{name}: install the brotli package to precompress into .br files")
+
+    with span(f"optimize {name}", "build"):
+        stats = assets.optimize(output, options)
+
+    utils.echo_info(
+        f"""  - {name}: fingerprinted {stats["fingerprinted"]}, precompressed {stats["compressed"]} file(s)"""
+    )
+
+
+def _write_asset_handlers(conf, builds):
+    """
+    Writes the app.yaml handlers serving the fingerprinted assets of optimized builds with a long cache lifetime.
+    """
+    folders = {
+        output: options
+        for build_cfg in builds.values()
+        if (options := assets.settings(build_cfg))
+        and (output := buildcache.output_path(conf, build_cfg)) and os.path.isdir(output)
+    }
+
+    app_yaml = os.path.join(conf["distribution_folder"], conf.get("appyaml", "app.yaml"))
+    if not folders or not os.path.exists(app_yaml):
+        return
+
+    try:
+        handlers = assets.handlers(app_yaml, folders)
+    except (OSError, ValueError) as e:
+        utils.echo_warning(f"Unable to read the handlers of {app_yaml}: {e}")
+        return
+
+    path = assets.write_handlers(app_yaml, handlers)
+
+    if path == app_yaml:
+        utils.echo_info(f"- wrote {len(handlers)} handler(s) for fingerprinted assets into {app_yaml}")
+    else:
+        utils.echo_warning(
+            f"Wrote {len(handlers)} handler(s) for fingerprinted assets to {path}; put the lines "
+            f"{assets.HANDLERS_BEGIN!r} and {assets.HANDLERS_END!r} into the handlers of {app_yaml}, "
+            f"before the static_dir handlers, to update them there"
+        )
+
+
+def _fingerprints(conf, builds):
+    """
+    Returns the `buildcache.config_fingerprint()` of every build; raises a ValueError on invalid "depends_on".
+    """
+    depends_on = {name: buildcache.dependencies(build_cfg) for name, build_cfg in builds.items()}
+    fingerprints = {}
+
+    for name in executor.topological_order(builds, depends_on):
+        fingerprints[name] = buildcache.config_fingerprint(
+            conf, builds[name], [fingerprints[dependency] for dependency in depends_on[name]]
+        )
+
+    return fingerprints
+
+
+def _changed_paths(ref):
+    """
+    Returns the absolute paths of all files which changed since a git ref, including uncommitted and untracked ones.
+    """
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.splitlines()
+        except (OSError, subprocess.CalledProcessError) as e:
+            reason = (getattr(e, "stderr", None) or str(e)).strip()
+            utils.echo_fatal(f"Unable to determine the files changed since {ref!r}: {reason}")
+
+    root = git("rev-parse", "--show-toplevel")[0]
+    changed = git("diff", "--name-only", "--no-renames", ref, "--")
+    changed += git("ls-files", "--others", "--exclude-standard", "--full-name")
+
+    return {os.path.abspath(os.path.join(root, path)) for path in changed if path}
+
+
+def _affected(conf, builds, changed, config_file):
+    """
+    Decides which builds are affected by the changed paths.
+
+    A build is affected when files in its source folder changed, when it depends on an affected build, or when it
+    can't be decided: it has no source folder, or the configuration file changed.
+
+    :return: Two dicts of build names to the reason why they are affected, and why they are skipped.
+    """
+    affected = {}
+    skipped = {}
+    depends_on = {name: buildcache.dependencies(build_cfg) for name, build_cfg in builds.items()}
+
+    for name in executor.topological_order(builds, depends_on):
+        source = buildcache.source_path(conf, builds[name])
+
+        if os.path.abspath(config_file) in changed:
+            affected[name] = f"{os.path.basename(config_file)} changed"
+        elif source is None:
+            affected[name] = "has no source folder"
+        elif any(os.path.commonpath((os.path.abspath(source), path)) == os.path.abspath(source) for path in changed):
+            affected[name] = f"files in {source} changed"
+        elif dependencies := [dependency for dependency in depends_on[name] if dependency in affected]:
+            affected[name] = f"""depends on {", ".join(dependencies)}"""
+        else:
+            skipped[name] = f"no changes in {source}"
+
+    return affected, skipped
+
+
+def _release(profile, conf, builds, jobs=None, force=False, timings=None, reuse=None, skip=None):
+    """
+    Builds all given build configurations of a profile, running independent ones concurrently.
+
+    A build configuration may list the names of builds it requires in "depends_on"; it only starts when all of them
+    finished successfully. The first failing build cancels all others.
+    With a single job, the builds run one after another, attached to the terminal.
+    Builds of kind "exec", like `viur package install`, may change project.json; they run one at a time unless they
+    set "parallel".
+
+    Builds whose inputs didn't change since their last successful build, and whose "target" folder is still intact,
+    are skipped unless `force` is set; outputs of inputs built before are restored from the artifact cache.
+    See `buildcache`.
+
+    Builds listed in `reuse` aren't built, but their output is materialized from the output folder it maps them to,
+    e.g. of an identical build of another profile. Builds listed in `skip` aren't built at all.
+
+    Outputs of builds with "optimize" are post-processed by `assets.optimize()`, before they are recorded.
+
+    When a `timings` dict is given, it is filled with the seconds spent per phase ("install", "build", "optimize")
+    and the "output_size" in bytes for every build.
+
+    :return: A dict of build names to their `executor.TargetResult`.
+    """
+    reuse = reuse or {}
+    skip = skip or ()
+    runner = executor.Executor(jobs, fail_fast=True)
+    capture = runner.jobs > 1
+    # Captured output is multiplexed into prefixed lines and a log file per build
+    runner.log = logs.LogMultiplexer("build") if capture else None
+    manifest = buildcache.Manifest(profile)
+    artifacts = buildcache.ArtifactCache()
+
+    depends_on = {name: buildcache.dependencies(build_cfg) for name, build_cfg in builds.items()}
+
+    def target(name, build_cfg):
+        async def run():
+            phases = {}
+            if timings is not None:
+                timings[name] = phases
+
+            if name in skip:
+                return "skipped"
+
+            # Hashing reads files, so let independent targets do it concurrently
+            inputs = await asyncio.to_thread(manifest.input_digest, conf, name, build_cfg, depends_on[name])
+
+            if name in reuse:
+                output = buildcache.output_path(conf, build_cfg)
+                if output and (source := reuse[name]) and os.path.abspath(source) != os.path.abspath(output):
+                    if not os.path.isdir(source):
+                        utils.echo_error(f"{name}: output {source} of the identical build is missing")
+                        return False
+
+                    await asyncio.to_thread(buildcache.replace_folder, source, output)
+
+                utils.echo_info(f"""- {build_cfg["kind"]} {name} reused from identical build""")
+                await asyncio.to_thread(manifest.record, conf, name, build_cfg, inputs)
+                return "reused"
+
+            if not force and await asyncio.to_thread(manifest.is_up_to_date, conf, name, build_cfg, inputs):
+                utils.echo_info(f"""- {build_cfg["kind"]} {name} is up-to-date""")
+                return "up-to-date"
+
+            manifest.forget(name)
+            output = buildcache.output_path(conf, build_cfg)
+
+            if output and not force and await asyncio.to_thread(artifacts.restore, inputs, output):
+                utils.echo_info(f"""- {build_cfg["kind"]} {name} restored from cache""")
+                await asyncio.to_thread(manifest.record, conf, name, build_cfg, inputs)
+                return "cached"
+
+            utils.echo_info(f"""- {build_cfg["kind"]} {name}""")
+            if output:
+                await asyncio.to_thread(buildcache.detach, output)
+
+            with span(f"build {name}", "build", kind=build_cfg["kind"]):
+                for step in _build_steps(conf, name, build_cfg, capture):
+                    result = await runner.execute(step.process)
+                    phases[step.phase] = phases.get(step.phase, 0.0) + result.duration
+
+                    if not result.ok:
+                        utils.echo_error(
+                            f"{name}: failed to execute {step.process.command!r} (exit code {result.exit_code})"
+                        )
+                        return False
+
+                    if step.on_success:
+                        step.on_success()
+
+            if output and (options := assets.settings(build_cfg)):
+                start = time.monotonic()
+                await asyncio.to_thread(_optimize, name, output, options)
+                phases["optimize"] = time.monotonic() - start
+
+            # An install without a lockfile creates one in the source folder
+            if "install" in phases:
+                inputs = await asyncio.to_thread(manifest.input_digest, conf, name, build_cfg, depends_on[name])
+
+            await asyncio.to_thread(manifest.record, conf, name, build_cfg, inputs)
+            if output:
+                await asyncio.to_thread(artifacts.store, inputs, output)
+
+                if timings is not None:
+                    phases["output_size"] = await asyncio.to_thread(buildcache.folder_size, output)
+
+            return True
+
+        return run
+
+    try:
+        with runner.log or contextlib.nullcontext():
+            return runner.run_graph(
+                {name: target(name, build_cfg) for name, build_cfg in builds.items()},
+                depends_on,
+                # Exec builds may share state like the project.json, unless they opt in
+                exclusive=[
+                    name for name, build_cfg in builds.items()
+                    if build_cfg["kind"] == "exec" and not build_cfg.get("parallel")
+                ],
+            )
+    except ValueError as e:
+        utils.echo_fatal(f"Invalid depends_on in builds: {e}")
+    finally:
+        manifest.save()
+
+
+def _print_results(results):
+    """
+    Prints the status and wall time of every build.
+    """
+    width = max((len(name) for name in results), default=0)
+
+    for name, result in results.items():
+        click.echo(
+            f"  {name:<{width}}  "
+            + click.style(f"{result.status:<10}", fg="green" if result.ok else "red")
+            + (f"  {result.duration:8.2f}s" if result.duration else "")
+        )
+
+
 def _clean(conf, name, build_cfg):
     """
     Perform steps required to clean a given build configuration.
 
     This internal function is responsible for cleaning the artifacts and files generated during the build process
-    for a specified application. It supports two types of cleaning methods:
+    for a specified application. It supports three types of cleaning methods:
         - npm: For cleaning Node.js applications built with npm package manager.
+        - pnpm: Like npm; the package store shared with other builds is kept.
         - exec: For executing custom clean commands specified in the build configuration.
 
     :param conf: dict
@@ -85,8 +417,8 @@ def _clean(conf, name, build_cfg):
         Raises an exception if an unknown build "kind" is encountered in the build configuration.
 
     The `_clean` function performs the following steps based on the build "kind":
-    - For "npm" builds, it deletes the specified target folder, and if available, it executes a custom "clean"
-    command.
+    - For "npm" and "pnpm" builds, it moves the specified target folder and node_modules into the trash folder of the
+    project, and if available, it executes a custom "clean" command.
     - For "exec" builds, it executes the custom clean command provided in the build configuration.
 
     Note:
@@ -100,18 +432,18 @@ def _clean(conf, name, build_cfg):
 
     match build_cfg["kind"]:
         # for npm, drop the target folder and node_modules (npm)
-        case "npm":
+        case "npm" | "pnpm":
             if target_dir := build_cfg.get("target"):
                 target_dir = os.path.join(conf["distribution_folder"], target_dir)
                 utils.echo_info(f"  - dropping {target_dir}")
-                utils.rmdir(target_dir)
+                utils.trash(target_dir)
 
-            if build_cfg["kind"] == "npm":
+            if build_cfg["kind"] in ("npm", "pnpm"):
                 # todo: Later, call "npm run clean" or a similar command when it exists
 
                 node_modules = os.path.join(conf["sources_folder"], build_cfg["source"], "node_modules")
                 utils.echo_info(f"  - dropping {node_modules}")
-                utils.rmdir(os.path.join(node_modules))
+                utils.trash(node_modules)
 
         case "exec":
             pass
@@ -133,7 +465,15 @@ def build():
 @build.command(context_settings={"ignore_unknown_options": True})
 @click.argument("profile", default='default')
 @click.argument("additional_args", nargs=-1)
-def release(profile, additional_args):
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=None,
+              help="Number of builds to run concurrently (default: number of CPUs)")
+@click.option("--force", "-f", is_flag=True, default=False, help="Rebuild applications which are up-to-date")
+@click.option("--report", is_flag=True, default=False, help="Append the timings to the build history")
+@click.option("--profile", "-p", "more_profiles", multiple=True,
+              help="Further profile to build in the same run, may be repeated")
+@click.option("--affected-since", metavar="GIT-REF",
+              help="Only build applications affected by the changes since this git ref")
+def release(profile, additional_args, jobs, force, report, more_profiles, affected_since):
     """
     Build all relevant applications to deploy this project.
 
@@ -141,21 +481,89 @@ def release(profile, additional_args):
     specify the project configuration to use and any additional arguments to pass to the build process.
 
     The `release` command loads the specified project configuration, which includes build configurations for
-    individual applications. It then iterates through the applications and executes the build process for each one
-    using the `_build` function.
+    individual applications. Independent applications are built concurrently, with their output prefixed by
+    the application name; an application listing other builds in "depends_on" is built after them.
+    The first failing build stops all others. The complete output of every build is written to
+    .viur/logs/build/<name>.log, keeping the logs of the previous four releases.
+
+    Applications declaring a "target" folder are skipped when neither their configuration, their source folder,
+    the build tools nor their dependencies changed since their last build, and the target folder is still intact.
+    The fingerprints are kept in .viur/build-manifest.json; use --force to rebuild everything.
+    With --report, the duration of every build is appended to .viur/build-history.jsonl, see `viur build stats`.
+    Outputs of inputs which were built before, e.g. on another branch, are restored from a cache in
+    ~/.cache/viur-cli/builds.
+
+    Further profiles given by --profile are built one after another in the same run. Applications whose effective
+    configuration equals one of a previous profile aren't built again; their output is copied into the target folder
+    of the profile instead.
+
+    The output of applications with "optimize" is precompressed and optionally fingerprinted after building, and
+    handlers serving fingerprinted files with a long cache lifetime are written into app.yaml.
+
+    With --affected-since, e.g. in CI, only applications are built whose source folder contains files which changed
+    since the given git ref, or which depend on such an application. All applications are built when project.json
+    changed; applications without a source folder are always built.
 
     Note:
 
         - Ensure that the specified project configuration exists.
 
+        - Use --jobs 1 to build one application after another, e.g. for interactive build commands.
+
         - Additional arguments can be used to customize the build process.
 
     """
-    conf = config.get_profile(profile)
+    profiles = list(dict.fromkeys((profile, *more_profiles)))
+    confs = {profile: config.get_profile(profile) for profile in profiles}
+    changed = _changed_paths(affected_since) if affected_since else None
     utils.echo_info("building started...")
 
-    for build_name, build_cfg in conf.get("builds", {}).items():
-        _build(conf, build_name, build_cfg, additional_args)
+    # Output folders of the builds done so far, by the fingerprint of their configuration
+    outputs = {}
+
+    for profile, conf in confs.items():
+        builds = conf.get("builds", {})
+
+        try:
+            fingerprints = _fingerprints(conf, builds)
+
+            if changed is not None:
+                affected, skipped = _affected(conf, builds, changed, os.path.join(config.path, config.FILENAME))
+            else:
+                affected, skipped = {}, {}
+
+        except ValueError as e:
+            utils.echo_fatal(f"Invalid depends_on in builds: {e}")
+
+        if len(profiles) > 1:
+            utils.echo_info(f"building profile {profile}...")
+
+        if changed is not None:
+            for name, reason in skipped.items():
+                utils.echo_info(f"- skipping {name}: {reason} since {affected_since}")
+
+            for name, reason in affected.items():
+                utils.echo_info(f"- affected {name}: {reason}")
+
+        timings = {} if report else None
+        results = _release(
+            profile, conf, builds, jobs, force, timings,
+            reuse={name: outputs[fingerprint] for name, fingerprint in fingerprints.items() if fingerprint in outputs},
+            skip=skipped,
+        )
+        _print_results(results)
+
+        if report:
+            buildhistory.append(buildhistory.entries_of(profile, results, timings))
+
+        if failed := [name for name, result in results.items() if not result.ok]:
+            utils.echo_fatal(f"""building failed: {", ".join(failed)}""")
+
+        _write_asset_handlers(conf, builds)
+
+        for name, fingerprint in fingerprints.items():
+            if name not in skipped:
+                outputs.setdefault(fingerprint, buildcache.output_path(conf, builds[name]))
 
     utils.echo_info("building finished!")
 
@@ -191,10 +599,140 @@ def app(appname, profile, additional_args):
     utils.echo_info("building finished!")
 
 
+class _BuildWatcher:
+    """
+    Maps file system events to the builds whose source folder contains the changed files, and rebuilds each of them
+    once its files stopped changing for `debounce` seconds.
+    """
+
+    def __init__(self, conf, builds, debounce):
+        self.conf = conf
+        self.builds = builds
+        self.debounce = debounce
+        self.sources = {}
+        self.outputs = {}
+        self.pending = {}
+        self.condition = threading.Condition()
+
+        for name, build_cfg in builds.items():
+            if (source := buildcache.source_path(conf, build_cfg)) is not None:
+                self.sources[name] = os.path.abspath(source)
+
+            if output := buildcache.output_path(conf, build_cfg):
+                self.outputs[name] = os.path.abspath(output)
+
+    def targets_of(self, path):
+        """
+        Returns the builds affected by a changed path.
+        """
+        path = os.path.abspath(path)
+        if buildcache.IGNORED_NAMES.intersection(path.split(os.sep)):
+            return []
+
+        # Outputs written into a source folder must not trigger another build
+        if any(os.path.commonpath((output, path)) == output for output in self.outputs.values()):
+            return []
+
+        return [name for name, source in self.sources.items() if os.path.commonpath((source, path)) == source]
+
+    def on_event(self, event):
+        if event.event_type in ("opened", "closed_no_write") or (event.is_directory and event.event_type == "modified"):
+            return
+
+        names = self.targets_of(event.src_path) + self.targets_of(getattr(event, "dest_path", "") or event.src_path)
+
+        with self.condition:
+            for name in names:
+                self.pending[name] = time.monotonic() + self.debounce
+
+            if names:
+                self.condition.notify()
+
+    def run(self):
+        """
+        Rebuilds pending builds one after another, until interrupted.
+        """
+        while True:
+            with self.condition:
+                while not self.pending or (wait := min(self.pending.values()) - time.monotonic()) > 0:
+                    self.condition.wait(wait if self.pending else None)
+
+                now = time.monotonic()
+                due = [name for name, at in self.pending.items() if at <= now]
+                for name in due:
+                    del self.pending[name]
+
+            for name in due:
+                self.rebuild(name)
+
+    def rebuild(self, name):
+        build_cfg = self.builds[name]
+        utils.echo_info(f"""- {build_cfg["kind"]} {name}""")
+        start = time.monotonic()
+
+        if output := buildcache.output_path(self.conf, build_cfg):
+            buildcache.detach(output)
+
+        with span(f"build {name}", "build", kind=build_cfg["kind"]):
+            for step in _build_steps(self.conf, name, build_cfg, capture=False):
+                if not (result := executor.run([step.process])[0]).ok:
+                    utils.echo_error(
+                        f"{name}: failed to execute {step.process.command!r} (exit code {result.exit_code})"
+                    )
+                    return
+
+                if step.on_success:
+                    step.on_success()
+
+        utils.echo_success(f"{name} rebuilt in {time.monotonic() - start:.2f}s")
+
+
+@build.command()
+@click.argument("profile", default="default")
+@click.option("--debounce", type=click.FloatRange(min=0), default=0.5, show_default=True,
+              help="Seconds to wait for further changes before rebuilding")
+def watch(profile, debounce):
+    """
+    Rebuild applications when their sources change.
+
+    Watches the source folders of all builds. When files in a source folder change, only the build owning it is
+    rebuilt, once the changes settled; npm dependencies are only installed again when package.json or the lockfile
+    changed. Stop watching with Ctrl-C.
+    """
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    conf = config.get_profile(profile)
+    watcher = _BuildWatcher(conf, conf.get("builds", {}), debounce)
+
+    if not watcher.sources:
+        utils.echo_fatal("None of the builds has a source folder to watch")
+
+    event_handler = FileSystemEventHandler()
+    event_handler.on_any_event = watcher.on_event
+
+    observer = Observer()
+    for source in set(watcher.sources.values()):
+        if os.path.isdir(source):
+            observer.schedule(event_handler, source, recursive=True)
+
+    observer.start()
+    utils.echo_info(f"""Watching {", ".join(watcher.sources)}...""")
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+
+
 @build.command
 @click.argument("target", default="")
 @click.argument("profile", default="default")
-def clean(target, profile):
+@click.option("--wait", is_flag=True, default=False, help="Wait until the dropped folders are deleted")
+def clean(target, profile, wait):
     """
     Clean up build artifacts.
 
@@ -212,7 +750,11 @@ def clean(target, profile):
 
         - When specifying a 'target,' ensure that it corresponds to a valid application defined in your project.
 
-        - Running the command without a 'target' will clean all applications.
+        - Running the command without a 'target' will clean all applications, and drop the package store shared
+        by pnpm builds.
+
+        - Dropped folders are moved into .viur/trash and deleted in the background, so the command returns right
+        away and a following build can start immediately; use --wait to wait for the deletion, e.g. in CI.
     """
 
     conf = config.get_profile(profile)
@@ -229,4 +771,108 @@ def clean(target, profile):
     for build_name, build_cfg in builds.items():
         _clean(conf, build_name, build_cfg)
 
+    # The shared store is only dropped together with all builds using it
+    if not target and any(build_cfg["kind"] == "pnpm" for build_cfg in builds.values()):
+        utils.echo_info(f"- dropping the shared pnpm store {buildcache.PNPM_STORE_FOLDER}")
+        utils.trash(buildcache.PNPM_STORE_FOLDER)
+
+    utils.empty_trash(wait)
     utils.echo_info("clean finished!")
+
+
+@build.command()
+@click.argument("profile", required=False)
+@click.option("--last", type=click.IntRange(min=1), default=10, show_default=True,
+              help="Number of previous builds to compare against")
+@click.option("--threshold", type=click.FloatRange(min=0), default=20.0, show_default=True,
+              help="Percentage of growth in duration or output size which counts as regression")
+@click.option("--fail", is_flag=True, default=False, help="Exit with an error when a regression was found")
+def stats(profile, last, threshold, fail):
+    """
+    Show build timing trends and regressions.
+
+    Compares the latest successful build of every application, recorded by `viur build release --report`,
+    against the median of its previous builds, and flags applications whose duration or output size grew beyond
+    the threshold.
+    """
+    # Like the history written by releases, it is located in the project root
+    history = buildhistory.load(os.path.join(config.path, buildhistory.HISTORY_FILE))
+
+    if not (report := buildhistory.analyze(history, profile, last, threshold)):
+        utils.echo_info("No builds recorded yet, run `viur build release --report` first")
+        return
+
+    def percent(value):
+        return "" if value is None else f"{value:+.0f}%"
+
+    def size(value):
+        return "" if value is None else f"{value / 1024 / 1024:.1f} MiB"
+
+    width = max(len("target"), *(len(row["target"]) for row in report))
+    click.echo(f"""  {"target":<{width}}  {"runs":>4}  {"last":>8}  {"median":>8}  {"change":>6}  """
+               f"""{"size":>10}  {"change":>6}  trend""")
+
+    for row in report:
+        line = (
+            f"""  {row["target"]:<{width}}  {row["runs"]:>4}  {row["duration"]:>7.2f}s  """
+            + (f"""{row["baseline"]:>7.2f}s""" if row["baseline"] is not None else " " * 8)
+            + f"""  {percent(row["duration_change"]):>6}  {size(row["size"]):>10}  {percent(row["size_change"]):>6}  """
+            + buildhistory.sparkline(row["durations"])
+        )
+        click.echo(click.style(line, fg="red") if row["regressed"] else line)
+
+    if regressed := [row["target"] for row in report if row["regressed"]]:
+        utils.echo_warning(f"""Regressed beyond {threshold:g}%: {", ".join(regressed)}""")
+
+        if fail:
+            sys.exit(1)
+
+
+@build.group()
+def cache():
+    """Share build outputs between machines like CI runners."""
+
+
+@cache.command("export")
+@click.argument("file", type=click.Path(dir_okay=False, writable=True))
+@click.argument("profile", default="default")
+def export_cache(file, profile):
+    """
+    Export up-to-date build outputs into an archive.
+
+    Writes the target folders of all applications which are up-to-date, together with the fingerprints of their
+    inputs, into a tar archive (compressed when the file name ends with .tar.gz, .tar.bz2 or .tar.xz).
+    """
+    conf = config.get_profile(profile)
+    manifest = buildcache.Manifest(profile)
+
+    exported = buildcache.export_archive(file, conf, conf.get("builds", {}), manifest)
+    manifest.save()
+
+    if not exported:
+        utils.echo_warning("No up-to-date builds to export, run `viur build release` first")
+        return
+
+    utils.echo_success(f"""Exported {len(exported)} build(s) to {file}: {", ".join(exported)}""")
+
+
+@cache.command("import")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+@click.argument("profile", default="default")
+def import_cache(file, profile):
+    """
+    Import build outputs from an archive.
+
+    Restores the target folders from an archive written by `viur build cache export`. A following
+    `viur build release` skips all applications whose inputs match the imported fingerprints.
+    """
+    conf = config.get_profile(profile)
+    manifest = buildcache.Manifest(profile)
+
+    try:
+        imported = buildcache.import_archive(file, conf, conf.get("builds", {}), manifest)
+    except (OSError, ValueError, KeyError, tarfile.TarError) as e:
+        utils.echo_fatal(f"Unable to import {file}: {e}")
+
+    manifest.save()
+    utils.echo_success(f"""Imported {len(imported)} build(s) from {file}: {", ".join(imported)}""")
@@ -0,0 +1,569 @@
+"""
+Incremental builds: fingerprints the inputs and outputs of build targets and remembers them in a manifest inside
+the project, so that `viur build release` can skip targets which are up-to-date.
+
+The inputs of a target are its build configuration, the files of its "source" folder (including the lockfile),
+the versions of the build tools and the outputs of the builds it depends on. Its output is the folder "target"
+inside the distribution folder.
+
+Outputs are additionally kept in a user-wide artifact cache keyed by the input digest, so that returning to
+previously built inputs, e.g. after switching branches, restores the output instead of building it again.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from .utils import cache_dir
+from .version import __version__
+
+MANIFEST_FILE = os.path.join(".viur", "build-manifest.json")
+"""
+Location of the build manifest, relative to the project root.
+"""
+
+IGNORED_NAMES = {".git", ".svn", ".hg", ".viur", "node_modules", "__pycache__", ".DS_Store"}
+"""
+File and folder names which never count as build inputs or outputs.
+"""
+
+INSTALL_STAMP_FILE = ".viur-install-stamp"
+"""
+File inside node_modules, which records the fingerprint of the dependencies it was installed from.
+"""
+
+DEPENDENCY_FILES = {
+    "npm": ("package.json", "package-lock.json"),
+    "pnpm": ("package.json", "pnpm-lock.yaml"),
+}
+"""
+Files declaring the dependencies of a source folder, per build kind.
+"""
+
+PNPM_STORE_FOLDER = os.path.join(".viur", "pnpm-store")
+"""
+Content-addressable package store shared by all pnpm builds of the project, relative to the project root.
+Keeping it inside the project puts it on the same file system as the sources, so packages can be hardlinked.
+"""
+
+CACHE_SIZE_ENV = "VIUR_BUILD_CACHE_SIZE"
+"""
+Environment variable to set the size limit of the artifact cache in MiB.
+"""
+
+DEFAULT_CACHE_SIZE = 4096
+"""
+Default size limit of the artifact cache in MiB.
+"""
+
+ARCHIVE_FORMAT = 1
+"""
+Version of the layout of archives written by `export_archive()`.
+"""
+
+RACY_INTERVAL = 2.0
+"""
+Seconds within which a file modification may not change its mtime, so digests of such recent files aren't reused.
+"""
+
+
+def source_path(conf, build_cfg):
+    """
+    Returns the source folder of a build configuration, or None.
+    """
+    if (source := build_cfg.get("source")) is None:
+        return None
+
+    return os.path.join(conf["sources_folder"], source)
+
+
+def output_path(conf, build_cfg):
+    """
+    Returns the output folder of a build configuration, or None when it doesn't declare a "target".
+    """
+    if not (target := build_cfg.get("target")):
+        return None
+
+    return os.path.join(conf["distribution_folder"], target)
+
+
+def dependencies(build_cfg):
+    """
+    Returns the names of the builds listed in "depends_on" of a build configuration.
+    """
+    depends_on = build_cfg.get("depends_on") or []
+    return [depends_on] if isinstance(depends_on, str) else list(depends_on)
+
+
+def config_fingerprint(conf, build_cfg, dependencies=()):
+    """
+    Returns a digest of the effective configuration of a build, independent of the profile it belongs to.
+
+    It covers the build configuration, its resolved source folder and the fingerprints of the builds it depends on,
+    but not the distribution folder; equally configured builds of different profiles share a fingerprint.
+    """
+    source = source_path(conf, build_cfg)
+
+    return hashlib.sha256(json.dumps({
+        "config": build_cfg,
+        "source": source and os.path.abspath(source),
+        "dependencies": list(dependencies),
+    }, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@functools.cache
+def tool_versions(kind):
+    """
+    Returns the versions of the tools used by a build kind; a changed tool invalidates all of its builds.
+    """
+    versions = {"viur-cli": __version__, "python": sys.version.split()[0]}
+
+    if kind in DEPENDENCY_FILES:
+        for tool in ("node", kind):
+            try:
+                versions[tool] = subprocess.run(
+                    [tool, "--version"], capture_output=True, text=True, timeout=30
+                ).stdout.strip()
+            except (OSError, subprocess.SubprocessError):
+                versions[tool] = None
+
+    return versions
+
+
+def install_stamp(source, kind="npm"):
+    """
+    Returns a fingerprint of the dependencies of a source folder: its package.json, the lockfile of the build kind
+    and the versions of node and the package manager.
+    """
+    # Upgrading viur-cli or Python doesn't touch node_modules, so their versions are left out
+    versions = {tool: version for tool, version in tool_versions(kind).items() if tool in ("node", kind)}
+    digest = hashlib.sha256(json.dumps(versions, sort_keys=True).encode())
+
+    for filename in DEPENDENCY_FILES[kind]:
+        try:
+            with open(os.path.join(source, filename), "rb") as f:
+                digest.update(f"{filename}\0".encode() + f.read() + b"\0")
+        except FileNotFoundError:
+            pass
+
+    return digest.hexdigest()
+
+
+def is_installed(source, stamp):
+    """
+    Checks whether node_modules of a source folder were installed from the dependencies fingerprinted by stamp.
+    """
+    try:
+        with open(os.path.join(source, "node_modules", INSTALL_STAMP_FILE)) as f:
+            return f.read().strip() == stamp
+    except OSError:
+        return False
+
+
+def mark_installed(source, stamp):
+    # Projects without dependencies don't get a node_modules folder
+    os.makedirs(os.path.join(source, "node_modules"), exist_ok=True)
+
+    with open(os.path.join(source, "node_modules", INSTALL_STAMP_FILE), "w") as f:
+        f.write(stamp)
+
+
+class TreeHasher:
+    """
+    Computes digests of folder trees.
+
+    The digests of files are remembered with their size and mtime, and reused while both are unchanged,
+    so only modified files are read again.
+    """
+
+    def __init__(self, known=None):
+        self.known = known or {}
+        self.seen = {}
+
+    def file_digest(self, path, st):
+        if (entry := self.known.get(path)) and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            self.seen[path] = entry
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+
+        digest = digest.hexdigest()
+
+        if time.time() - st.st_mtime > RACY_INTERVAL:
+            self.seen[path] = [st.st_size, st.st_mtime_ns, digest]
+
+        return digest
+
+    def tree_digest(self, root, exclude=()):
+        """
+        Returns a digest over the relative paths and contents of all files below root, or None if root is missing.
+
+        Folders in `exclude` are skipped, e.g. an output folder located inside a source folder.
+        """
+        if not os.path.isdir(root):
+            return None
+
+        exclude = {os.path.abspath(path) for path in exclude if path}
+        entries = []
+
+        for folder, dirs, files in os.walk(root):
+            dirs[:] = sorted(
+                name for name in dirs
+                if name not in IGNORED_NAMES and os.path.abspath(os.path.join(folder, name)) not in exclude
+            )
+
+            for name in sorted(files):
+                if name in IGNORED_NAMES:
+                    continue
+
+                path = os.path.join(folder, name)
+
+                try:
+                    st = os.stat(path)
+                    digest = self.file_digest(path, st)
+                except OSError:
+                    # Broken symlinks and files removed meanwhile
+                    continue
+
+                entries.append(f"{os.path.relpath(path, root)}\0{digest}")
+
+        return hashlib.sha256("\n".join(entries).encode()).hexdigest()
+
+
+class Manifest:
+    """
+    Records the input and output digests of every successfully built target of a profile.
+
+    The records of each profile are kept apart, as the same build may have another output folder in another profile.
+    """
+
+    def __init__(self, profile="default", path=MANIFEST_FILE):
+        self.path = path
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+
+        except (OSError, ValueError):
+            data = {}
+
+        self.profiles = data.get("profiles", {})
+        self.targets = self.profiles.setdefault(profile, {})
+        self.hasher = TreeHasher(data.get("files", {}))
+
+    def input_digest(self, conf, name, build_cfg, depends_on=()):
+        """
+        Returns the digest of all inputs of a target; its dependencies must be recorded already.
+        """
+        source = source_path(conf, build_cfg)
+
+        inputs = {
+            "name": name,
+            "config": build_cfg,
+            "output": output_path(conf, build_cfg),
+            "tools": tool_versions(build_cfg["kind"]),
+            "source": source and self.hasher.tree_digest(source, exclude=[output_path(conf, build_cfg)]),
+            # Dependencies without a verifiable output change their dependents on every build
+            "dependencies": {
+                dependency: (record := self.targets.get(dependency) or {}).get("output") or record.get("time")
+                for dependency in depends_on
+            },
+        }
+
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+    def output_digest(self, conf, build_cfg):
+        if not (output := output_path(conf, build_cfg)):
+            return None
+
+        return self.hasher.tree_digest(output)
+
+    def is_up_to_date(self, conf, name, build_cfg, inputs):
+        """
+        Checks whether a target was built from the same inputs, and its output is still intact.
+
+        Targets without a "target" folder can't be verified and are never up-to-date.
+        """
+        if not (record := self.targets.get(name)) or record["inputs"] != inputs or not record.get("output"):
+            return False
+
+        return self.output_digest(conf, build_cfg) == record["output"]
+
+    def record(self, conf, name, build_cfg, inputs):
+        self.targets[name] = {
+            "inputs": inputs,
+            "output": self.output_digest(conf, build_cfg),
+            "time": time.time(),
+        }
+
+    def forget(self, name):
+        self.targets.pop(name, None)
+
+    def save(self):
+        """
+        Writes the manifest atomically, dropping remembered digests of files which don't exist anymore.
+        """
+        files = {
+            path: entry for path, entry in (self.hasher.known | self.hasher.seen).items() if os.path.exists(path)
+        }
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"profiles": self.profiles, "files": files}, f, separators=(",", ":"))
+
+            os.replace(tmp_path, self.path)
+
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+def archive_mode(path, mode):
+    """
+    Returns the tarfile mode for reading ("r") or writing ("w") an archive, compressed according to its extension.
+    """
+    if mode == "r":
+        return "r:*"
+
+    for extensions, compression in (((".tar.gz", ".tgz"), "gz"), ((".tar.bz2", ".tbz2"), "bz2"), ((".tar.xz",), "xz")):
+        if path.endswith(extensions):
+            return f"w:{compression}"
+
+    return "w"
+
+
+def export_archive(path, conf, builds, manifest):
+    """
+    Writes the outputs of all up-to-date builds together with their manifest records into a tar archive.
+
+    :return: The names of the exported builds.
+    """
+    records = {}
+
+    with tarfile.open(path, archive_mode(path, "w")) as tar:
+        for name, build_cfg in builds.items():
+            if not (output := output_path(conf, build_cfg)) or not (record := manifest.targets.get(name)):
+                continue
+
+            inputs = manifest.input_digest(conf, name, build_cfg, dependencies(build_cfg))
+
+            if not manifest.is_up_to_date(conf, name, build_cfg, inputs):
+                continue
+
+            tar.add(output, arcname=f"outputs/{name}")
+            records[name] = record | {"path": output}
+
+        data = json.dumps({"format": ARCHIVE_FORMAT, "targets": records}).encode()
+        info = tarfile.TarInfo("manifest.json")
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+
+    return list(records)
+
+
+def import_archive(path, conf, builds, manifest):
+    """
+    Restores the outputs of an archive written by `export_archive()` into their target folders, and records them
+    in the manifest, so that they count as up-to-date as long as their inputs match.
+
+    Builds which don't exist in the given configuration, or have another target folder, are ignored.
+
+    :return: The names of the imported builds.
+    """
+    imported = []
+    os.makedirs(os.path.dirname(manifest.path), exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(manifest.path)) as tmp, \
+            tarfile.open(path, archive_mode(path, "r")) as tar:
+
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(tmp, filter="data")
+        else:
+            for member in tar.getmembers():
+                if (os.path.isabs(member.name) or ".." in member.name.split("/")
+                        or not (member.isfile() or member.isdir())):
+                    raise ValueError(f"Refusing to extract {member.name!r}")
+
+            tar.extractall(tmp)
+
+        with open(os.path.join(tmp, "manifest.json")) as f:
+            data = json.load(f)
+
+        if data.get("format") != ARCHIVE_FORMAT:
+            raise ValueError(f"Unsupported archive format {data.get('format')!r}")
+
+        for name, record in data["targets"].items():
+            if not (build_cfg := builds.get(name)) or output_path(conf, build_cfg) != record.pop("path"):
+                continue
+
+            output = output_path(conf, build_cfg)
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+            if os.path.isdir(output):
+                shutil.rmtree(output)
+
+            shutil.move(os.path.join(tmp, "outputs", name), output)
+            manifest.targets[name] = record
+            imported.append(name)
+
+    return imported
+
+
+def link_or_copy(src, dst):
+    """
+    Hardlinks a file, or copies it when the destination is on another filesystem.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def replace_folder(src, dst):
+    """
+    Replaces folder dst by a copy of folder src, hardlinking files where possible.
+    """
+    tmp_dst = f"{dst.rstrip(os.sep)}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    shutil.copytree(src, tmp_dst, copy_function=link_or_copy, symlinks=True)
+
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+
+    os.replace(tmp_dst, dst)
+
+
+def detach(folder):
+    """
+    Replaces hardlinked files below folder by copies, so that builds overwriting their output files in place don't
+    modify cached artifacts.
+    """
+    if not os.path.isdir(folder):
+        return
+
+    for parent, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(parent, name)
+
+            if not os.path.islink(path) and os.stat(path).st_nlink > 1:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                shutil.copy2(path, tmp_path)
+                os.replace(tmp_path, path)
+
+
+def folder_size(folder):
+    return sum(
+        os.lstat(os.path.join(parent, name)).st_size
+        for parent, _, files in os.walk(folder) for name in files
+    )
+
+
+class ArtifactCache:
+    """
+    Content-addressed store of build outputs in ~/.cache/viur-cli/builds, keyed by the input digest of a target.
+
+    Outputs are stored and restored as hardlinks where possible. When the cache grows beyond its size limit,
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, root=None, max_size=None):
+        self.root = root or cache_dir("builds")
+
+        if max_size is None:
+            max_size = int(os.environ.get(CACHE_SIZE_ENV) or DEFAULT_CACHE_SIZE) * 1024 * 1024
+
+        self.max_size = max_size
+
+    def entry(self, key):
+        return os.path.join(self.root, key)
+
+    def restore(self, key, output):
+        """
+        Replaces the output folder by the cached artifact for key, returning False when there is none.
+        """
+        entry = self.entry(key)
+
+        try:
+            with open(os.path.join(entry, "meta.json")) as f:
+                json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        replace_folder(os.path.join(entry, "output"), output)
+
+        # The modification time of the metadata is the last use of an entry
+        os.utime(os.path.join(entry, "meta.json"))
+        return True
+
+    def store(self, key, output):
+        """
+        Adds the output folder as artifact for key, and evicts old entries if the cache became too large.
+        """
+        entry = self.entry(key)
+        if not os.path.isdir(output):
+            return
+
+        if not os.path.exists(entry):
+            tmp_entry = f"{entry}.{os.getpid()}.tmp"
+
+            try:
+                shutil.copytree(output, os.path.join(tmp_entry, "output"), copy_function=link_or_copy, symlinks=True)
+
+                with open(os.path.join(tmp_entry, "meta.json"), "w") as f:
+                    json.dump({"size": folder_size(tmp_entry), "created": time.time()}, f)
+
+                os.rename(tmp_entry, entry)
+
+            except OSError:
+                # Another process stored the same artifact meanwhile
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        self.evict()
+
+    def entries(self):
+        """
+        Returns (last use, size, path) of all cache entries.
+        """
+        entries = []
+
+        for name in os.listdir(self.root):
+            meta_file = os.path.join(self.root, name, "meta.json")
+
+            try:
+                with open(meta_file) as f:
+                    size = json.load(f)["size"]
+
+                entries.append((os.stat(meta_file).st_mtime, size, os.path.join(self.root, name)))
+
+            except (OSError, ValueError, KeyError):
+                continue
+
+        return entries
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits into its size limit.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -0,0 +1,134 @@
+"""
+History of build timings, written by `viur build release --report` and analyzed by `viur build stats`.
+
+Every build of a reported release is appended as one JSON line to the history file inside the project.
+"""
+
+import datetime
+import json
+import os
+import statistics
+
+HISTORY_FILE = os.path.join(".viur", "build-history.jsonl")
+"""
+Location of the build history, relative to the project root.
+"""
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def append(entries, path=HISTORY_FILE):
+    """
+    Appends the given entries to the history.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "a") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def load(path=HISTORY_FILE):
+    """
+    Returns all entries of the history, skipping corrupt lines.
+    """
+    entries = []
+
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+
+    except FileNotFoundError:
+        pass
+
+    return entries
+
+
+def entries_of(profile, results, timings):
+    """
+    Builds the history entries of a release from its results and timings.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+    return [
+        {
+            "time": now,
+            "profile": profile,
+            "target": name,
+            "status": result.status,
+            "duration": round(result.duration, 3),
+        } | {
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in timings.get(name, {}).items()
+        }
+        for name, result in results.items()
+    ]
+
+
+def sparkline(values):
+    if not values:
+        return ""
+
+    low, high = min(values), max(values)
+    scale = (high - low) or 1
+
+    return "".join(SPARK_CHARS[round((value - low) / scale * (len(SPARK_CHARS) - 1))] for value in values)
+
+
+def change(current, baseline):
+    """
+    Returns the relative change of current against baseline in percent, or None.
+    """
+    if current is None or not baseline:
+        return None
+
+    return (current - baseline) / baseline * 100
+
+
+def analyze(entries, profile=None, last=10, threshold=20.0):
+    """
+    Compares the latest build of every target against the median of its previous `last` builds.
+
+    Only builds which actually ran successfully (status "ok") are considered, as skipped builds take no time.
+
+    :return: A list of dicts per target with "target", "runs", "durations" (the compared durations, oldest first),
+        "duration", "baseline", "duration_change", "size", "size_baseline", "size_change" and "regressed".
+    """
+    runs = {}
+
+    for entry in entries:
+        if entry.get("status") == "ok" and (profile is None or entry.get("profile") == profile):
+            runs.setdefault(entry["target"], []).append(entry)
+
+    report = []
+
+    for target, target_runs in runs.items():
+        latest, previous = target_runs[-1], target_runs[-last - 1:-1]
+
+        baseline = statistics.median(run["duration"] for run in previous) if previous else None
+        sizes = [run["output_size"] for run in previous if run.get("output_size") is not None]
+        size_baseline = statistics.median(sizes) if sizes else None
+
+        duration_change = change(latest["duration"], baseline)
+        size_change = change(latest.get("output_size"), size_baseline)
+
+        report.append({
+            "target": target,
+            "runs": len(target_runs),
+            "durations": [run["duration"] for run in target_runs[-last - 1:]],
+            "duration": latest["duration"],
+            "baseline": baseline,
+            "duration_change": duration_change,
+            "size": latest.get("output_size"),
+            "size_baseline": size_baseline,
+            "size_change": size_change,
+            "regressed": any(
+                value is not None and value > threshold for value in (duration_change, size_change)
+            ),
+        })
+
+    return report
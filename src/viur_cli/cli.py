@@ -1,20 +1,174 @@
+import functools
+import importlib
+import json
 import re
+import shutil
 import subprocess
+import sys
+import typing
 import click
+from click.utils import make_default_short_help
 from .conf import *
 from .version import __version__
 from .version import MINIMAL_PIPENV
-import semver
 import pprint
 import os
 from pathlib import Path
 
 
-@click.group(invoke_without_command=True, no_args_is_help=True,
+class LazyCommand(typing.NamedTuple):
+    """
+    Registry entry for a subcommand whose module is only imported when the subcommand is resolved.
+    """
+
+    import_path: str
+    """
+    The ``module:attribute`` path of the click command.
+    """
+
+    help: str = ""
+    """
+    The short help shown in the command listing and shell completion, without importing the module.
+    """
+
+    hidden: bool = False
+    """
+    Hide the command from the command listing and shell completion.
+    """
+
+
+LAZY_COMMANDS = {
+    "batch": LazyCommand("viur_cli.batch:batch", "Run several viur commands in one process."),
+    "build": LazyCommand("viur_cli.build:build", "Build VIUR project or specific apps."),
+    "check": LazyCommand("viur_cli.local:check", "Perform security checks for vulnerabilities."),
+    "cloud": LazyCommand(
+        "viur_cli.cloud:cloud", "This method defines a command group for working with cloud resources."
+    ),
+    "create": LazyCommand("viur_cli.setup:create", "Create a new ViUR project."),
+    "daemon": LazyCommand("viur_cli.daemon:daemon", "Manage a warm viur process for fast repeated commands."),
+    "deploy": LazyCommand("viur_cli.deprecated:deploy", hidden=True),
+    "env": LazyCommand("viur_cli.local:env", "Check the local environment for ViUR development."),
+    "install": LazyCommand("viur_cli.deprecated:install", hidden=True),
+    "package": LazyCommand("viur_cli.package:package", "Performs installements and updates of ViUR Ecosystem packages"),
+    "run": LazyCommand("viur_cli.local:run", "Start your application locally."),
+    "script": LazyCommand("viur_cli.scriptor.cli:script", "Manage and run scriptor scripts locally on the console"),
+    "tool": LazyCommand("viur_cli.tool:tool", "Run different ViUR-related scripts."),
+    "update": LazyCommand("viur_cli.update:update", "Update project-specific files and dependencies."),
+}
+"""
+Subcommands of the `viur` entry point which are resolved on demand, so that `--help`, `--version` and
+shell completion don't pay the import cost of every command module.
+"""
+
+
+class LazyGroup(click.Group):
+    """
+    A click group which imports the module of a subcommand only when that subcommand is invoked.
+
+    Commands from the `lazy_commands` registry are listed with their registered short help until they have been
+    loaded; afterwards they behave like any regular subcommand added via `@group.command()`.
+    """
+
+    def __init__(self, *args, lazy_commands: dict[str, LazyCommand] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def parse_args(self, ctx, args):
+        # click would take the subcommand as the value of a preceding option with an optional value,
+        # so these options only accept their value in the "--option=value" form.
+        args = list(args)
+        for i, arg in enumerate(args):
+            if not arg.startswith("-"):
+                break
+
+            for param in self.params:
+                if getattr(param, "_flag_needs_value", False) and arg in param.opts:
+                    args[i] = f"{arg}={param.flag_value}"
+
+        return super().parse_args(ctx, args)
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and (lazy := self.lazy_commands.get(cmd_name)):
+            module_name, attr = lazy.import_path.split(":")
+            # Importing the module registers its commands via the `@cli.command()` decorators
+            cmd = getattr(importlib.import_module(module_name), attr)
+            self.commands.setdefault(cmd_name, cmd)
+
+        return super().get_command(ctx, cmd_name)
+
+    def visible_commands(self, ctx) -> list[tuple[str, typing.Callable[[int], str]]]:
+        """
+        Lists the names of all non-hidden subcommands together with a function rendering their short help,
+        without importing any lazy command module.
+        """
+        commands = []
+
+        for cmd_name in self.list_commands(ctx):
+            if cmd := self.commands.get(cmd_name):
+                if not cmd.hidden:
+                    commands.append((cmd_name, cmd.get_short_help_str))
+
+            elif not (lazy := self.lazy_commands[cmd_name]).hidden:
+                commands.append((cmd_name, lambda limit=45, text=lazy.help: make_default_short_help(text, limit)))
+
+        return commands
+
+    def format_commands(self, ctx, formatter):
+        if not (commands := self.visible_commands(ctx)):
+            return
+
+        # allow for 3 times the default spacing, like click does
+        limit = formatter.width - 6 - max(len(cmd_name) for cmd_name, _ in commands)
+
+        with formatter.section("Commands"):
+            formatter.write_dl([(cmd_name, short_help(limit)) for cmd_name, short_help in commands])
+
+    def shell_complete(self, ctx, incomplete):
+        from click.shell_completion import CompletionItem
+
+        results = [
+            CompletionItem(cmd_name, help=short_help())
+            for cmd_name, short_help in self.visible_commands(ctx)
+            if cmd_name.startswith(incomplete)
+        ]
+        results.extend(click.Command.shell_complete(self, ctx, incomplete))
+        return results
+
+
+DAEMON_ENV = "VIUR_DAEMON"
+"""
+Environment variable which enables forwarding of `viur` invocations to a running `viur daemon`.
+"""
+
+
+def main():
+    """
+    Entry point of the `viur` command.
+
+    When $VIUR_DAEMON is set and a daemon is running for the current project, the invocation is forwarded to it,
+    otherwise the command runs in this process.
+    """
+    if os.environ.get(DAEMON_ENV):
+        from .daemon import forward
+
+        if (exit_code := forward()) is not None:
+            sys.exit(exit_code)
+
+    cli(prog_name="viur")
+
+
+@click.group(cls=LazyGroup, lazy_commands=LAZY_COMMANDS, invoke_without_command=True, no_args_is_help=True,
              context_settings={"help_option_names": ["-h", "--help"]})
 @click.version_option(__version__)
+@click.option("--profile-run", is_flag=False, flag_value="", default=None, metavar="[=PATH]",
+              help="Profile the invoked command and write the profile to PATH (*.json for speedscope, else pstats).")
+@click.option("--timings", is_flag=False, flag_value="", default=None, metavar="[=PATH]",
+              help="Trace all subprocesses and HTTP requests and write them as Chrome trace to PATH.")
 @click.pass_context
-def cli(ctx):
+def cli(ctx, profile_run, timings):
     """
     Command-line interface for managing project configuration and information.
 
@@ -26,22 +180,85 @@ def cli(ctx):
         - Use the `--version` option to display the CLI tool's version.
 
         - Run the 'project' command to manage 'project.json' and project configuration settings.
+
+        - Use `--profile-run` to see where the time of a slow command is spent.
+
+        - Use `--timings` to see which external processes and network requests a command waits for.
     """
+    if timings is not None:
+        from .tracing import Tracer, default_output
+
+        tracer = Tracer(timings or default_output())
+        tracer.install()
+        ctx.call_on_close(tracer.stop)
+
+    if profile_run is not None:
+        from .profiling import RunProfiler, default_output
+
+        profiler = RunProfiler(profile_run or default_output())
+        profiler.start()
+        ctx.call_on_close(profiler.stop)
+
+    check_pipenv_version()
+
+
+@functools.cache
+def check_pipenv_version():
+    """
+    Warns when the system's pipenv is older than MINIMAL_PIPENV.
+
+    This is done only once per process, even when several commands are run by `viur batch` or the daemon.
+
+    The probe result is cached per resolved pipenv binary and its modification time,
+    so `pipenv --version` is only executed again after pipenv has been upgraded.
+    """
+    cache_file = os.path.join(cache_dir(), "pipenv.json")
+    cache_key = None
+
+    if pipenv := shutil.which("pipenv"):
+        pipenv = os.path.realpath(pipenv)
+        cache_key = [pipenv, os.stat(pipenv).st_mtime_ns, MINIMAL_PIPENV]
+
+        try:
+            with open(cache_file) as f:
+                cached = json.load(f)
+
+            if cached["key"] == cache_key:
+                if cached["outdated"]:
+                    echo_pipenv_warning(cached["version"])
+                return
+
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    import semver
 
     # Get the systems pipenv Version Number
-    pipenv_version = subprocess.check_output(['pipenv', '--version']).decode("utf-8")
+    pipenv_version = subprocess.check_output([pipenv or 'pipenv', '--version']).decode("utf-8")
     version_pattern = r'\b(\d+\.\d+\.\d+)\b'
     match = re.search(version_pattern, pipenv_version)
     sys_pipenv = match.group(1)
 
     # sys kleiner min
-    if semver.compare(sys_pipenv, MINIMAL_PIPENV) < 0:
-        echo_warning(
-            f"Your pipenv Version does not match the recommended pipenv version. \n"
-            f"This mismatch may cause Errors, please consider updating your Systems pipenv version \n"
-            f"Your Version: {sys_pipenv}\n"
-            f"Recommended Version: {MINIMAL_PIPENV}"
-        )
+    outdated = semver.compare(sys_pipenv, MINIMAL_PIPENV) < 0
+    if outdated:
+        echo_pipenv_warning(sys_pipenv)
+
+    if cache_key:
+        try:
+            with open(cache_file, "w") as f:
+                json.dump({"key": cache_key, "version": sys_pipenv, "outdated": outdated}, f)
+        except OSError:
+            pass
+
+
+def echo_pipenv_warning(sys_pipenv):
+    echo_warning(
+        f"Your pipenv Version does not match the recommended pipenv version. \n"
+        f"This mismatch may cause Errors, please consider updating your Systems pipenv version \n"
+        f"Your Version: {sys_pipenv}\n"
+        f"Recommended Version: {MINIMAL_PIPENV}"
+    )
 
 
 @cli.command()
@@ -3,12 +3,13 @@ from pathlib import Path
 import subprocess
 import os
 import string
+import sys
 import time
 import click
 import yaml
 from viur_cli import echo_success, echo_warning, echo_fatal
 from .conf import config
-from . import cli, echo_error, echo_info, replace_vars
+from . import cli, echo_error, echo_info, executor, logs, replace_vars, utils
 from .update import create_req
 
 
@@ -145,10 +146,21 @@ def init(service, profile):
         - profile (str): The profile name to be used for initialization. Default value is 'default'.
 
     """
-    deployments = ["cron", "queue", "cron"]
+    deployments = ["cron", "queue"]
     if service == "gcloud":
-        for element in deployments:
-            os.system(f"viur cloud deploy {element} {profile} -y")
+        # The deployments are independent of each other, so they run in parallel
+        with logs.LogMultiplexer("deploy", os.path.join(config.path, logs.LOGS_FOLDER, "deploy")) as log:
+            results = executor.run(
+                (
+                    executor.Process([sys.executable, "-m", "viur_cli", "cloud", "deploy", element, profile, "-y"],
+                                     name=element)
+                    for element in deployments
+                ),
+                log=log,
+            )
+
+        if failed := [result.process.name for result in results if not result.ok]:
+            echo_fatal(f"Failed to deploy {', '.join(failed)}")
 
 
 @cloud.command(context_settings={"ignore_unknown_options": True})
@@ -501,7 +513,7 @@ def deploy(action, profile, name, ext, yes, skip_checks: bool, additional_args):
             additional_args = [f"--appyaml={app_yaml_tmp.resolve()}", *additional_args]
 
         try:
-            os.system(
+            utils.system(
                 f'gcloud app deploy --project={conf["application_name"]} --version={version} '
                 f'--no-promote {" ".join(additional_args)} {conf["distribution_folder"]} {"-q" if yes else ""}'
             )
@@ -512,7 +524,7 @@ def deploy(action, profile, name, ext, yes, skip_checks: bool, additional_args):
                 app_yaml_hidden.rename(app_yaml)
 
     elif action == "cloudfunction":
-        os.system(build_deploy_command(name, conf["gcloud"]))
+        utils.system(build_deploy_command(name, conf["gcloud"]))
 
     else:
         if action not in ["index", "queue", "cron"]:
@@ -567,7 +579,7 @@ def deploy(action, profile, name, ext, yes, skip_checks: bool, additional_args):
                 echo_error(f"{yaml_file} is not a valid")
                 return
 
-        os.system(
+        utils.system(
             f'gcloud app deploy --project={conf["application_name"]} {" ".join(additional_args)} {yaml_file} {"-q" if yes else ""}')
 
 
@@ -693,9 +705,14 @@ def create(profile, action, gen, source, name, entrypoint, env_vars_file, memory
                                                         "(deploy/cloudfunction/{FileName})")
                                                     )
 
-        conf["gcloud"]["functions"][function_name] = function_dict
+        # Only the new settings are written to the profile, not what it inherits from the profile it extends
+        inherited = config.get_profile(profile).get("gcloud", {})
+        gcloud = config[profile].setdefault("gcloud", {})
+        for key in ("max-instances", "region"):
+            if key not in inherited:
+                gcloud[key] = conf["gcloud"][key]
 
-        config[profile] = conf
-        config.migrate()
+        gcloud.setdefault("functions", {})[function_name] = function_dict
+        config.save()
         echo_success("Your cloud function creation was successful, if you want to add more flags, "
                       "add them in your project.json")
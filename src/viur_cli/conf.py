@@ -1,8 +1,11 @@
+import atexit
+import copy
 import json
 import click
-import requests
 import difflib
 import os
+import threading
+import time
 from .utils import *
 from .version import __version__ as cli_version
 
@@ -24,10 +27,8 @@ class Config(dict):
 
     def __init__(self, *, path=None):
         self.path = path
-
-        if self.VERSION:
-            self["format"] = self.VERSION
-
+        self._saved = None
+        self._save_pending = False
         self.load()
 
     def load(self):
@@ -46,7 +47,8 @@ class Config(dict):
             if os.getcwd() == "/":
 
                 if self.path:
-                    self.save()
+                    self.write()
+                    os.chdir(self.path)
                     self.load()
                     return
                 else:
@@ -56,10 +58,11 @@ class Config(dict):
             echo_info(f"Project root is {os.getcwd()}")
 
         try:
-            f = open(self.FILENAME, "r")
-            self.path = os.getcwd()
-            self.update(json.loads(f.read()))
+            with open(self.FILENAME, "r") as f:
+                self.path = os.getcwd()
+                self.update(json.loads(f.read()))
 
+            self._saved = self.snapshot()
 
         except FileNotFoundError:
             echo_fatal(f"Can't open {self.FILENAME} for reading")
@@ -76,14 +79,72 @@ class Config(dict):
         """
         pass
 
+    def serialize(self):
+        """
+        Returns the configuration as it is written to the file.
+        """
+        return json.dumps(self, indent=4, sort_keys=True) + "\n"
+
+    def snapshot(self):
+        """
+        Returns a compact representation of the configuration, used to detect changes.
+
+        Unlike the indented `serialize()`, this uses the C-accelerated JSON encoder and is cheap for large files.
+        """
+        return json.dumps(self, sort_keys=True)
+
+    @property
+    def dirty(self):
+        """
+        Whether the configuration has been changed since it was loaded or written.
+        """
+        return self._saved != self.snapshot()
+
     def save(self):
         """
-        Write the current configuration back to the file.
+        Schedule writing the current configuration back to the file.
+
+        Multiple saves by a command are coalesced into a single write when viur-cli exits,
+        which is skipped entirely when nothing has changed. Use `flush()` to write immediately.
         """
-        os.chdir(self.path)
-        with open(self.FILENAME, "w") as f:
-            json.dump(self, f, indent=4, sort_keys=True)
-            f.write('\n')
+        if not self._save_pending:
+            self._save_pending = True
+            atexit.register(self.flush)
+
+    def flush(self):
+        """
+        Write a scheduled save to the file, if the configuration was changed.
+        """
+        if not self._save_pending:
+            return
+
+        self._save_pending = False
+        atexit.unregister(self.flush)
+
+        if self.dirty:
+            self.write()
+
+    def write(self):
+        """
+        Write the current configuration to the file.
+
+        The file is replaced atomically, so concurrent viur-cli processes never read a partially written file.
+        """
+        data = self.serialize()
+        filename = os.path.join(self.path, self.FILENAME)
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+
+        try:
+            with open(tmp_filename, "w") as f:
+                f.write(data)
+
+            os.replace(tmp_filename, filename)
+
+        finally:
+            if os.path.exists(tmp_filename):
+                os.unlink(tmp_filename)
+
+        self._saved = self.snapshot()
 
 
 class ProjectConfig(Config):
@@ -91,16 +152,65 @@ class ProjectConfig(Config):
     VERSION = "2.0.0"
 
     def __init__(self):
+        self._profiles = {}
         self["default"] = {}
         super().__init__()
 
+    def __setitem__(self, key, value):
+        self.invalidate()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.invalidate()
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        self.invalidate()
+        super().update(*args, **kwargs)
+
+    def save(self):
+        self.invalidate()
+        super().save()
+
+    def invalidate(self):
+        """
+        Drop all resolved profiles.
+
+        This happens automatically when a profile is replaced or the configuration is saved;
+        changes to nested values must be followed by `save()` or an explicit call.
+        """
+        self._profiles.clear()
+
     def get_profile(self, profile):
-        """Get profile configuration"""
+        """
+        Get profile configuration.
+
+        A profile is deep-merged over the profile named by its "extends" key, which defaults to "default".
+        Resolved profiles are cached until the configuration changes; each call returns an independent copy.
+        """
+        if profile not in self._profiles:
+            self._profiles[profile] = self.resolve_profile(profile)
+
+        return copy.deepcopy(self._profiles[profile])
+
+    def resolve_profile(self, profile, chain=()):
+        """Resolve a profile along its "extends" chain, without caching"""
         if profile == "format":
             echo_fatal("Your profile can not be named 'Format' ")
-        if profile not in self:
+        if not isinstance(self.get(profile), dict):
             echo_fatal(f"{profile!r} is not a valid profile name")
-        return self["default"].copy() | self[profile]
+        if profile in chain:
+            echo_fatal(f"Profile {profile!r} extends itself: {' -> '.join((*chain, profile))}")
+
+        profile_cfg = self[profile]
+
+        if profile == "default":
+            return deep_merge({}, profile_cfg)
+
+        parent = profile_cfg.get("extends", "default")
+        profile_cfg = {k: v for k, v in profile_cfg.items() if k != "extends"}
+
+        return deep_merge(self.resolve_profile(parent, (*chain, profile)), profile_cfg)
 
     def find_key(self, dictionary, target_key, target, keep=False):
         if target_key in dictionary:
@@ -126,7 +236,28 @@ class ProjectConfig(Config):
                 self.remove_key(value, target_key)
 
     def migrate(self):
+        if self.get("cli-version") != cli_version:
+            print_changelog_from_github('viur-framework', 'viur-cli', self.get("cli-version") or None)
+            self["cli-version"] = cli_version
+            self.save()
+
+        # Up-to-date configurations don't need to be walked at all
+        if self.get("format") != self.VERSION or "format" in self["default"]:
+            self.normalize()
+
+            while (config_format := self["format"]) != self.VERSION:
+                assert config_format in self.MIGRATIONS, "Invalid formatversion, you have to fix it manually"
+                self["format"] = self.MIGRATIONS[config_format](self)
+
+            self.save()
+
+        # Written right away, so viur processes started by this command don't migrate again
+        self.flush()
 
+    def normalize(self):
+        """
+        Brings the layout of a configuration in any previous format into shape, before the format migrations run.
+        """
         if "application_name" not in self["default"]:
             self.find_key(self, target_key="application_name", target="default", keep=True)
             if "application_name" in self:
@@ -143,43 +274,17 @@ class ProjectConfig(Config):
             self["format"] = old_format
             del self["default"]["format"]
 
-        assert self["format"] in ["1.0.0", "1.0.1", "1.1.0", "1.1.1", "1.2.0", self.VERSION], \
-            "Invalid formatversion, you have to fix it manually"
+        # Configurations without any format are treated as current
+        self.setdefault("format", self.VERSION)
 
         # Version 1.0.1
         if (pyodide_version := self["default"].get("pyodide")) and pyodide_version.startswith("v"):
             self["default"]["pyodide"] = pyodide_version[1:]  # remove v prefix
 
-        if not self.get("cli-version"):
-            print_changelog_from_github('viur-framework', 'viur-cli', None)
-            self["cli-version"] = cli_version
-
-        elif self.get("cli-version") != cli_version:
-            print_changelog_from_github('viur-framework', 'viur-cli', self.get("cli-version"))
-            self["cli-version"] = cli_version
-
-        if self["format"] == "1.0.0":
-            self["format"] = "1.0.1"
-
-        # Version 1.1.1
-        if self["format"] == "1.1.0":
-            self["format"] = "1.1.1"
-            builds = self["default"].get("builds", {}).copy()
-            for k, v in builds.items():
-                if builds[k]["kind"] == "script":
-                    builds[k]["kind"] = "exec"
-            self["default"]["builds"] = builds
-
         # Check if Builds is in the project.json
         if "builds" not in self["default"].keys():
             self["default"]["builds"] = {}
 
-        if self["format"] == "1.1.1":
-            self["format"] = "2.0.0"
-            format_version_updated = True
-        else:
-            format_version_updated = False
-
         for entry in ("admin", "scriptor", "vi"):
             if entry in self["default"]:
                 version_value = self["default"][entry].lstrip("v")
@@ -190,41 +295,134 @@ class ProjectConfig(Config):
                 }
                 del self["default"][entry]
 
-        if format_version_updated:
-            response = click.prompt(
-                text="Do you want to enforce use of admin only? (yes/no/keep)",
-                type=click.Choice(["yes", "no", "keep"]),
-                default="yes"
-            )
+    def migrate_1_0_0(self):
+        return "1.0.1"
+
+    def migrate_1_0_1(self):
+        return "1.1.0"
+
+    def migrate_1_1_0(self):
+        for build_cfg in self["default"]["builds"].values():
+            if build_cfg["kind"] == "script":
+                build_cfg["kind"] = "exec"
+
+        return "1.1.1"
+
+    def migrate_1_1_1(self):
+        response = click.prompt(
+            text="Do you want to enforce use of admin only? (yes/no/keep)",
+            type=click.Choice(["yes", "no", "keep"]),
+            default="yes"
+        )
+
+        if response == "yes":
+            self["default"]["builds"].pop("vi", None)
+            echo_info("You are using the ViUR Admin")
+        elif response == "no":
+            self["default"]["builds"].pop("admin", None)
+            echo_info("You are using the Vi Administration")
+
+        return "2.0.0"
+
+    def migrate_1_2_0(self):
+        return "2.0.0"
+
+    MIGRATIONS = {
+        "1.0.0": migrate_1_0_0,
+        "1.0.1": migrate_1_0_1,
+        "1.1.0": migrate_1_1_0,
+        "1.1.1": migrate_1_1_1,
+        "1.2.0": migrate_1_2_0,
+    }
+    """
+    Migration steps by the format they migrate from, each returning the format it migrated to.
+    Steps are applied in a chain until the configuration reaches VERSION.
+    """
 
-            if response == "yes":
-                self["default"]["builds"].pop("vi", None)
-                echo_info("You are using the ViUR Admin")
-            elif response == "no":
-                self["default"]["builds"].pop("admin", None)
-                echo_info("You are using the Vi Administration")
 
-        self.save()
+CHANGELOG_URL = "https://raw.githubusercontent.com/{user}/{repo}/{ref}/CHANGELOG.md"
+CHANGELOG_DEADLINE = 3.0
+"""
+Maximum number of seconds the changelog download may block a command.
+"""
 
 
-def print_changelog_from_github(user, repo, last_version):
-    version_url = f"https://raw.githubusercontent.com/{user}/{repo}/main/CHANGELOG.md"
-    response = requests.get(version_url)
+def fetch_changelog(user, repo, ref, cache_key=None):
+    """
+    Fetch the CHANGELOG.md of a repository at a given git ref.
+
+    Changelogs are cached in the viur-cli cache directory under `cache_key` (which defaults to the ref),
+    so they are downloaded only once. Returns None when the changelog can't be fetched.
+    """
+    cache_file = os.path.join(cache_dir("changelog"), f"{user}-{repo}-{cache_key or ref}.md")
+
+    try:
+        with open(cache_file) as f:
+            return f.read()
+    except OSError:
+        pass
+
+    import requests
+
+    try:
+        response = requests.get(CHANGELOG_URL.format(user=user, repo=repo, ref=ref), timeout=CHANGELOG_DEADLINE)
+    except requests.RequestException:
+        return None
+
+    if not response.ok:
+        return None
 
+    try:
+        with open(cache_file + ".tmp", "w") as f:
+            f.write(response.text)
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError:
+        pass
+
+    return response.text
+
+
+def fetch_changelogs(user, repo, refs, deadline=CHANGELOG_DEADLINE):
+    """
+    Fetch the changelogs of several `refs` (a dict of ref to cache key) concurrently in background threads.
+
+    Waits at most `deadline` seconds in total; changelogs which are not available by then are returned as None.
+    The threads are daemonic, so a hanging download never delays the exit of viur-cli.
+    """
+    results = {}
+
+    def fetch(ref, cache_key):
+        results[ref] = fetch_changelog(user, repo, ref, cache_key)
+
+    threads = [threading.Thread(target=fetch, args=item, daemon=True) for item in refs.items()]
+    for thread in threads:
+        thread.start()
+
+    end = time.monotonic() + deadline
+    for thread in threads:
+        thread.join(max(0.0, end - time.monotonic()))
+
+    return {ref: results.get(ref) for ref in refs}
+
+
+def print_changelog_from_github(user, repo, last_version):
+    # The changelog on main changes over time, so it is cached per installed cli version
+    refs = {"main": f"main-{cli_version}"}
     if last_version is not None:
-        version_url1 = f"https://raw.githubusercontent.com/{user}/{repo}/{last_version}/CHANGELOG.md"
-        echo_warning(version_url1)
-        response1 = requests.get(version_url1)
+        refs[last_version] = None
 
-    if last_version is None and response.ok:
-        changelog_lines = response.text.split("\n")[:20]
+    changelogs = fetch_changelogs(user, repo, refs)
+    changelog = changelogs["main"]
+
+    if last_version is None and changelog is not None:
+        changelog_lines = changelog.split("\n")[:20]
         echo_info("It seems you have updated your viur-cli!\n "
                   "Please consider reading the changelog: https://github.com/viur-framework/viur-cli/blob/main/CHANGELOG.md")
         click.echo("\n".join(changelog_lines))
         click.confirm("Done?", default=True)
 
-    elif response.ok and response1.ok:
-        get_changelog_difference(response.text.split('\n'), response1.text.split('\n'))
+    elif changelog is not None and (last_changelog := changelogs.get(last_version)) is not None:
+        get_changelog_difference(changelog.split("\n"), last_changelog.split("\n"))
 
     else:
         echo_error("Unable to fetch the changelog.")
@@ -255,6 +453,72 @@ class ScriptorConfig(Config):
         super().__init__(**kwargs)
 
 
+class LazyConfig:
+    """
+    Proxy for a configuration, which is only created and loaded on first access.
+
+    This avoids searching, parsing and migrating configuration files for commands which never use them.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._config = None
+
+    def _load(self):
+        if self._config is None:
+            self._config = self._factory()
+
+        return self._config
+
+    def resolve(self):
+        """
+        Returns the configuration object itself, loading it if necessary.
+
+        Not named `get`, which is forwarded to the `dict.get` of the configuration.
+        """
+        return self._load()
+
+    @property
+    def loaded(self):
+        """
+        Whether the configuration has already been loaded.
+        """
+        return self._config is not None
+
+    def reset(self, factory=None):
+        """
+        Drop the loaded configuration, so it is loaded again on next access, optionally using another factory.
+        """
+        self._config = None
+
+        if factory:
+            self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+
+    def __delitem__(self, key):
+        del self._load()[key]
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        return repr(self._load())
+
+
 # Create specific configs
-config = ProjectConfig()
-scriptor_config = ScriptorConfig(path=config.path)
+config = LazyConfig(ProjectConfig)
+scriptor_config = LazyConfig(lambda: ScriptorConfig(path=config.path))
@@ -0,0 +1,468 @@
+"""
+Keeps a warm viur-cli process per project, which executes commands forwarded by a thin client.
+
+The daemon imports all command modules and loads the project.json once. Every forwarded command runs in a
+process forked from this warm state, which receives the terminal file descriptors of the client, so output,
+prompts and colors behave exactly as if the command ran locally.
+"""
+
+import click
+import hashlib
+import json
+import os
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+import traceback
+from . import cli, utils
+from .cli import DAEMON_ENV, LAZY_COMMANDS
+from .conf import config, scriptor_config, ProjectConfig
+
+START_TIMEOUT = 10.0
+"""
+Seconds `viur daemon start` waits for a daemon to accept connections.
+"""
+
+
+def find_project_root(path=None):
+    """
+    Returns the closest folder containing a project.json, without changing the working directory.
+    """
+    path = os.path.abspath(path or os.getcwd())
+
+    while not os.path.exists(os.path.join(path, ProjectConfig.FILENAME)):
+        if (parent := os.path.dirname(path)) == path:
+            return None
+
+        path = parent
+
+    return path
+
+
+def socket_folder():
+    """
+    Returns the folder of the daemon sockets, which is created accessible by the current user only.
+
+    Anyone able to connect to a socket can run viur commands as the daemon's user.
+    """
+    folder = os.path.join(utils.cache_dir(), "daemon")
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    return folder
+
+
+def socket_path(root):
+    """
+    Returns the path of the daemon socket for a project root.
+    """
+    return os.path.join(socket_folder(), hashlib.sha1(root.encode()).hexdigest()[:16] + ".sock")
+
+
+def connect(root):
+    """
+    Connects to the daemon of a project root, returning None when no daemon is running.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(socket_path(root))
+    except OSError:
+        sock.close()
+        return None
+
+    return sock
+
+
+def send_request(sock, request, fds=()):
+    """
+    Sends a length-prefixed JSON request, optionally passing file descriptors along.
+    """
+    payload = json.dumps(request).encode()
+    socket.send_fds(sock, [struct.pack("!I", len(payload)) + payload], list(fds))
+
+
+def receive_request(sock):
+    """
+    Receives a request sent by `send_request()`, returning the request and the passed file descriptors.
+    """
+    data, fds, _, _ = socket.recv_fds(sock, 65536, 3)
+
+    while len(data) < 4 or len(data) < 4 + struct.unpack("!I", data[:4])[0]:
+        if not (chunk := sock.recv(65536)):
+            raise ConnectionError("Incomplete request")
+
+        data += chunk
+
+    return json.loads(data[4:]), fds
+
+
+def send_response(sock, **response):
+    sock.sendall(json.dumps(response).encode() + b"\n")
+
+
+def forward(argv=None):
+    """
+    Runs a viur invocation inside the daemon of the current project.
+
+    Returns the exit code of the command, or None when there is no usable daemon and the command must run locally.
+    """
+    if not (root := find_project_root()) or not (sock := connect(root)):
+        return None
+
+    with sock:
+        send_request(
+            sock,
+            {
+                "argv": list(argv or sys.argv),
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+            },
+            (sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno())
+        )
+
+        responses = sock.makefile("r")
+        pid = None
+
+        def interrupt(signum, frame):
+            if pid:
+                os.kill(pid, signum)
+
+        for line in responses:
+            response = json.loads(line)
+
+            if "pid" in response:
+                pid = response["pid"]
+                signal.signal(signal.SIGINT, interrupt)
+                signal.signal(signal.SIGTERM, interrupt)
+
+            elif "exit" in response:
+                return response["exit"]
+
+            else:
+                # The daemon has been invalidated or refused to run the command
+                return None
+
+    return 1 if pid else None
+
+
+class Daemon:
+    """
+    Accepts forwarded invocations on a UNIX socket and runs each of them in a forked child process.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.path = socket_path(root)
+        self.children = {}
+        self.running = True
+        self.project_stamp = None
+        self.package_stamp = self.get_package_stamp()
+
+    @staticmethod
+    def get_package_stamp():
+        """
+        Fingerprint of the installed viur-cli sources; a changed package requires a new daemon.
+        """
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        stamp = []
+
+        for folder, _, files in os.walk(package_dir):
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    st = os.stat(os.path.join(folder, name))
+                    stamp.append((name, st.st_mtime_ns, st.st_size))
+
+        return stamp
+
+    def get_project_stamp(self):
+        try:
+            st = os.stat(os.path.join(self.root, ProjectConfig.FILENAME))
+        except FileNotFoundError:
+            return None
+
+        return st.st_mtime_ns, st.st_size
+
+    def preload(self):
+        """
+        Imports all command modules and loads the project configuration.
+        """
+        for cmd_name in LAZY_COMMANDS:
+            try:
+                cli.get_command(None, cmd_name)
+            except Exception as e:
+                utils.echo_warning(f"Unable to preload command {cmd_name!r}: {e}")
+
+        self.load_config()
+
+    def load_config(self):
+        os.chdir(self.root)
+        config.reset()
+        config.get_profile("default")
+        config.flush()
+        self.project_stamp = self.get_project_stamp()
+
+    def serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        os.chmod(self.path, 0o600)
+        listener.listen()
+
+        # Wake up the selector whenever a child process terminates
+        wakeup_r, wakeup_w = socket.socketpair()
+        wakeup_w.setblocking(False)
+        signal.set_wakeup_fd(wakeup_w.fileno())
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+
+        selector = selectors.DefaultSelector()
+        selector.register(listener, selectors.EVENT_READ)
+        selector.register(wakeup_r, selectors.EVENT_READ)
+
+        utils.echo_info(f"viur daemon for {self.root} listening on {self.path}")
+
+        try:
+            while self.running or self.children:
+                for key, _ in selector.select(timeout=1.0):
+                    if key.fileobj is wakeup_r:
+                        wakeup_r.recv(4096)
+                    elif self.running:
+                        conn, _ = listener.accept()
+                        self.handle(conn, (listener, wakeup_r, wakeup_w))
+
+                self.reap()
+
+                # Stop accepting new commands, but let running ones finish
+                if not self.running and listener.fileno() >= 0:
+                    selector.unregister(listener)
+                    listener.close()
+                    os.unlink(self.path)
+
+        finally:
+            if listener.fileno() >= 0 and os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def stop(self):
+        self.running = False
+
+    def reap(self):
+        """
+        Reports the exit codes of terminated children to their clients.
+        """
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+
+            if not pid:
+                break
+
+            if conn := self.children.pop(pid, None):
+                with conn:
+                    try:
+                        send_response(conn, exit=os.waitstatus_to_exitcode(status))
+                    except OSError:
+                        pass
+
+    def handle(self, conn, inherited):
+        try:
+            request, fds = receive_request(conn)
+        except (OSError, ValueError, ConnectionError):
+            conn.close()
+            return
+
+        if request.get("command"):
+            for fd in fds:
+                os.close(fd)
+
+            if request["command"] == "stop":
+                self.stop()
+
+            send_response(conn, status="running" if self.running else "stopping", children=len(self.children))
+            conn.close()
+            return
+
+        if self.get_package_stamp() != self.package_stamp:
+            # Code changes can't be reloaded, so let the client run the command itself
+            for fd in fds:
+                os.close(fd)
+
+            send_response(conn, restart=True)
+            conn.close()
+            self.stop()
+            return
+
+        if self.get_project_stamp() != self.project_stamp:
+            self.load_config()
+
+        if pid := os.fork():
+            for fd in fds:
+                os.close(fd)
+
+            self.children[pid] = conn
+            send_response(conn, pid=pid)
+            return
+
+        # Child process
+        exit_code = 1
+        try:
+            conn.close()
+            for sock in inherited:
+                sock.close()
+
+            exit_code = self.run(request, fds)
+
+        except BaseException:
+            traceback.print_exc()
+
+        finally:
+            os._exit(exit_code)
+
+    def run(self, request, fds):
+        """
+        Executes a forwarded invocation in the forked child and returns its exit code.
+        """
+        signal.set_wakeup_fd(-1)
+        for signum in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL if signum != signal.SIGINT else signal.default_int_handler)
+
+        for fd, target in zip(fds, (0, 1, 2)):
+            os.dup2(fd, target)
+            os.close(fd)
+
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", buffering=1, encoding="utf-8", errors="replace", closefd=False)
+        sys.stderr = open(2, "w", buffering=1, encoding="utf-8", errors="replace", closefd=False)
+
+        os.environ.clear()
+        os.environ.update(request["env"])
+        os.chdir(request["cwd"])
+        sys.argv = request["argv"]
+
+        # Like on a regular first access, the warm configuration changes into the project root when it is used.
+        project_config = config.resolve()
+        config.reset(lambda: os.chdir(project_config.path) or project_config)
+
+        try:
+            cli.main(args=sys.argv[1:], prog_name="viur")
+            exit_code = 0
+
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                exit_code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+
+        # os._exit() skips atexit, but scheduled config saves must be written
+        for lazy_config in (config, scriptor_config):
+            if lazy_config.loaded:
+                lazy_config.flush()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        return exit_code
+
+
+def query(root, command):
+    """
+    Sends a control command to the daemon of a project root, returning its response or None.
+    """
+    if not (sock := connect(root)):
+        return None
+
+    with sock:
+        send_request(sock, {"command": command})
+        line = sock.makefile("r").readline()
+
+    return json.loads(line) if line else None
+
+
+@cli.group()
+def daemon():
+    """
+    Manage a warm viur process for fast repeated commands.
+
+    A running daemon keeps all commands imported and the project.json loaded. Set the environment variable
+    VIUR_DAEMON=1 to forward `viur` invocations inside the project to it.
+    The daemon reloads the project.json when it changes and shuts down when viur-cli is updated.
+    """
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "fork"):
+        utils.echo_fatal("The viur daemon is only supported on POSIX systems")
+
+
+@daemon.command()
+@click.option("--foreground", is_flag=True, default=False, help="Run the daemon in this process")
+def start(foreground):
+    """Start the daemon for the current project."""
+    root = find_project_root()
+    if not root:
+        utils.echo_fatal(f"{ProjectConfig.FILENAME} not found - please check if you are in the right folder.")
+
+    if query(root, "status"):
+        utils.echo_info(f"The daemon for {root} is already running")
+        return
+
+    folder = socket_folder()
+    stat = os.stat(folder)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        utils.echo_fatal(f"{folder} must only be accessible by you, please run: chmod 700 {folder}")
+
+    if foreground:
+        server = Daemon(root)
+        server.preload()
+        server.serve()
+        return
+
+    log_file = os.path.splitext(socket_path(root))[0] + ".log"
+    with open(log_file, "a") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "viur_cli", "daemon", "start", "--foreground"],
+            cwd=root,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+
+    end = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < end:
+        if query(root, "status"):
+            utils.echo_success(f"Started the daemon for {root}")
+            utils.echo_info(f"Set {DAEMON_ENV}=1 to forward viur commands to it")
+            return
+
+        time.sleep(0.1)
+
+    utils.echo_fatal(f"The daemon did not start, see {log_file}")
+
+
+@daemon.command()
+def stop():
+    """Stop the daemon of the current project."""
+    if (root := find_project_root()) and query(root, "stop"):
+        utils.echo_success(f"Stopped the daemon for {root}")
+    else:
+        utils.echo_info("No daemon is running for this project")
+
+
+@daemon.command()
+def status():
+    """Show whether a daemon is running for the current project."""
+    if (root := find_project_root()) and (response := query(root, "status")):
+        utils.echo_info(f"The daemon for {root} is running with {response['children']} active command(s)")
+    else:
+        utils.echo_info("No daemon is running for this project")
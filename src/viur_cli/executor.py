@@ -0,0 +1,370 @@
+"""
+Runs external processes asynchronously, with bounded concurrency, timeouts, prefixed output and cancellation.
+
+Every command of viur-cli which spawns processes should use this module, so that independent steps can run in
+parallel and all processes are traced, timed out and cancelled in the same way.
+"""
+
+import asyncio
+import contextlib
+import dataclasses
+import os
+import signal
+import subprocess
+import time
+import typing
+import click
+from . import logs
+from .tracing import span
+
+TERMINATE_TIMEOUT = 5.0
+"""
+Seconds a terminated process gets to exit before it is killed.
+"""
+
+FAILED_STATUSES = ("failed", "blocked", "cancelled")
+"""
+Statuses of a `TargetResult` which count as failure.
+"""
+
+
+@dataclasses.dataclass
+class Process:
+    """
+    Specification of an external process.
+    """
+
+    command: str | list[str]
+    """
+    A shell command line, or an argument list which is executed without a shell.
+    """
+
+    name: str = None
+    """
+    Name used to prefix the output lines; defaults to the command.
+    """
+
+    cwd: str = None
+    env: dict[str, str] = None
+
+    timeout: float = None
+    """
+    Seconds after which the process is terminated.
+    """
+
+    capture: bool = True
+    """
+    Capture the output of the process. Otherwise, the process is attached to the terminal, which is required for
+    interactive commands, but such processes should not run in parallel.
+    """
+
+    echo: bool = True
+    """
+    Print captured output lines, prefixed by the name of the process.
+    """
+
+    @property
+    def label(self):
+        if self.name:
+            return self.name
+
+        return self.command if isinstance(self.command, str) else " ".join(self.command)
+
+
+@dataclasses.dataclass
+class ProcessResult:
+    """
+    Outcome of a process run by the `Executor`.
+    """
+
+    process: Process
+    exit_code: int | None
+    duration: float = 0.0
+    output: str = ""
+    timed_out: bool = False
+    cancelled: bool = False
+
+    @property
+    def ok(self):
+        return self.exit_code == 0 and not self.timed_out and not self.cancelled
+
+
+@dataclasses.dataclass
+class TargetResult:
+    """
+    Outcome of a target run by `Executor.run_graph()`.
+    """
+
+    name: str
+    status: str
+    """
+    "ok", "failed", "blocked" (a dependency failed), "cancelled", or any status returned by the target.
+    """
+
+    duration: float = 0.0
+
+    @property
+    def ok(self):
+        return self.status not in FAILED_STATUSES
+
+
+def topological_order(names: typing.Iterable[str], depends_on: dict[str, typing.Iterable[str]]) -> list[str]:
+    """
+    Orders names so that every name comes after its dependencies, keeping the given order where possible.
+
+    Raises a ValueError on unknown dependencies or cycles.
+    """
+    names = list(names)
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join((*path, name))}")
+
+        state[name] = "visiting"
+        for dependency in depends_on.get(name, ()):
+            if dependency not in names:
+                raise ValueError(f"{name!r} depends on unknown {dependency!r}")
+
+            visit(dependency, (*path, name))
+
+        state[name] = "done"
+        order.append(name)
+
+    for name in names:
+        visit(name, ())
+
+    return order
+
+
+class Executor:
+    """
+    Runs processes concurrently, limited to `jobs` at a time (default: number of CPUs).
+
+    With `fail_fast`, the first failing process cancels all processes still waiting or running.
+    Ctrl-C terminates all running processes.
+    With a `logs.LogMultiplexer`, captured output is also written to a log file per process name.
+    """
+
+    def __init__(self, jobs: int = None, fail_fast: bool = False, log: logs.LogMultiplexer = None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.fail_fast = fail_fast
+        self.log = log
+        self.colors = {}
+        self.semaphore = None
+
+    def run(self, processes: typing.Iterable[Process]) -> list[ProcessResult]:
+        """
+        Runs the processes and returns their results in the given order.
+        """
+        return asyncio.run(self.run_async(list(processes)))
+
+    async def run_async(self, processes: list[Process]) -> list[ProcessResult]:
+        self.semaphore = asyncio.Semaphore(self.jobs)
+        tasks = [asyncio.create_task(self.execute(process)) for process in processes]
+
+        try:
+            for future in asyncio.as_completed(tasks):
+                if not (await future).ok and self.fail_fast:
+                    break
+
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return [
+            ProcessResult(process, None, cancelled=True) if task.cancelled() else task.result()
+            for process, task in zip(processes, tasks)
+        ]
+
+    def run_graph(
+        self,
+        targets: dict[str, typing.Callable[[], typing.Awaitable[bool | str]]],
+        depends_on: dict[str, typing.Iterable[str]] = None,
+        exclusive: typing.Iterable[str] = (),
+    ) -> dict[str, TargetResult]:
+        """
+        Runs targets, which are coroutine functions usually awaiting `execute()`, as soon as their dependencies
+        succeeded. Independent targets run concurrently, at most `jobs` at a time.
+
+        The `exclusive` targets never run concurrently with each other; waiting for that doesn't take a job slot.
+
+        A target returns True or False, or a custom status string which counts as success.
+        Targets depending on a failed target are "blocked"; with `fail_fast`, a failure cancels all other targets.
+        """
+        return asyncio.run(self.run_graph_async(targets, depends_on or {}, set(exclusive)))
+
+    async def run_graph_async(self, targets, depends_on, exclusive=frozenset()) -> dict[str, TargetResult]:
+        # Slots are taken per target, the processes of a running target are not limited any further
+        self.semaphore = None
+        slots = asyncio.Semaphore(self.jobs)
+        exclusive_slot = asyncio.Lock()
+        results = {}
+        tasks = {}
+
+        async def run_target(name):
+            if dependencies := [tasks[dependency] for dependency in depends_on.get(name, ())]:
+                await asyncio.wait(dependencies)
+
+            if not all(dependency in results and results[dependency].ok for dependency in depends_on.get(name, ())):
+                results[name] = TargetResult(name, "blocked")
+                return
+
+            async with exclusive_slot if name in exclusive else contextlib.nullcontext(), slots:
+                start = time.monotonic()
+                status = await targets[name]()
+
+            if not isinstance(status, str):
+                status = "ok" if status else "failed"
+
+            results[name] = TargetResult(name, status, time.monotonic() - start)
+
+        for name in topological_order(targets, depends_on):
+            tasks[name] = asyncio.create_task(run_target(name))
+
+        try:
+            for future in asyncio.as_completed(tasks.values()):
+                await future
+                if self.fail_fast and any(not result.ok for result in results.values()):
+                    break
+
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        return {name: results.get(name) or TargetResult(name, "cancelled") for name in targets}
+
+    async def execute(self, process: Process) -> ProcessResult:
+        """
+        Runs a single process, waiting for a free job slot; only usable within `run()` or `run_graph()`.
+        """
+        async with self.semaphore or contextlib.nullcontext():
+            with span(process.label, "process", command=str(process.command)) as current:
+                if self.log and process.capture:
+                    self.log.start(process.label, str(process.command))
+
+                result = None
+                try:
+                    result = await self.spawn(process)
+                finally:
+                    if self.log and process.capture:
+                        self.log.finish(process.label, result and result.exit_code)
+
+                if current:
+                    current.event["args"] |= {"exit_code": result.exit_code, "bytes": len(result.output)}
+
+                return result
+
+    async def spawn(self, process: Process) -> ProcessResult:
+        kwargs = {"cwd": process.cwd, "env": process.env}
+        if process.capture:
+            # A separate session allows to terminate the entire process tree, e.g. of a shell running npm
+            kwargs |= {
+                "stdin": subprocess.DEVNULL,
+                "stdout": subprocess.PIPE,
+                "stderr": subprocess.STDOUT,
+                "start_new_session": hasattr(os, "killpg"),
+            }
+
+        start = time.monotonic()
+
+        try:
+            if isinstance(process.command, str):
+                proc = await asyncio.create_subprocess_shell(process.command, **kwargs)
+            else:
+                proc = await asyncio.create_subprocess_exec(*process.command, **kwargs)
+
+        except OSError as e:
+            return ProcessResult(process, 127, time.monotonic() - start, str(e))
+
+        output = []
+        timed_out = False
+
+        try:
+            await asyncio.wait_for(self.communicate(proc, process, output), process.timeout)
+
+        except asyncio.TimeoutError:
+            timed_out = True
+            logs.echo(self.prefix(process) + click.style(f"timed out after {process.timeout}s", fg="red"))
+            await self.terminate(proc, process)
+
+        except asyncio.CancelledError:
+            await self.terminate(proc, process)
+            raise
+
+        return ProcessResult(process, proc.returncode, time.monotonic() - start, "".join(output), timed_out)
+
+    async def communicate(self, proc, process: Process, output: list[str]):
+        if proc.stdout:
+            pending = ""
+
+            while chunk := await proc.stdout.read(65536):
+                lines = (pending + chunk.decode("utf-8", errors="replace")).split("\n")
+                pending = lines.pop()
+
+                for line in lines:
+                    self.emit(process, output, line + "\n")
+
+            if pending:
+                self.emit(process, output, pending)
+
+        await proc.wait()
+
+    def emit(self, process: Process, output: list[str], line: str):
+        output.append(line)
+
+        if self.log:
+            self.log.line(process.label, line, echo=process.echo)
+        elif process.echo:
+            click.echo(self.prefix(process) + line.rstrip("\n"))
+
+    def prefix(self, process: Process):
+        if self.log:
+            return self.log.prefix(process.label)
+
+        return logs.prefix(process.label, self.colors)
+
+    @staticmethod
+    async def terminate(proc, process: Process):
+        """
+        Terminates a process (including its children, if it runs in its own session), finally killing it.
+        """
+        for sig in (signal.SIGTERM, getattr(signal, "SIGKILL", signal.SIGTERM)):
+            if proc.returncode is not None:
+                return
+
+            try:
+                if process.capture and hasattr(os, "killpg"):
+                    os.killpg(proc.pid, sig)
+                else:
+                    proc.send_signal(sig)
+            except ProcessLookupError:
+                return
+
+            try:
+                await asyncio.wait_for(proc.wait(), TERMINATE_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+
+
+def run(
+    processes: typing.Iterable[Process], jobs: int = None, fail_fast: bool = False, log: logs.LogMultiplexer = None
+) -> list[ProcessResult]:
+    """
+    Runs processes concurrently and returns their results, see `Executor`.
+    """
+    return Executor(jobs, fail_fast, log).run(processes)
+
+
+def run_process(command: str | list[str], **kwargs) -> ProcessResult:
+    """
+    Runs a single process, see `Process` for the keyword arguments.
+    """
+    return run([Process(command, **kwargs)])[0]
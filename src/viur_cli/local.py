@@ -7,7 +7,7 @@ import subprocess
 
 from viur_cli import echo_info, echo_warning
 from .conf import config
-from . import cli, echo_error, utils, echo_fatal
+from . import cli, echo_error, executor, utils, echo_fatal
 from requests import get
 from .package import vi as vi_install
 from types import SimpleNamespace
@@ -87,83 +87,48 @@ def env(profile):
         echo_error(str(e))
     click.echo(f"\nCurrent Environment:\n--------------------------------")
 
-    # viur-cli
-    if shutil.which("viur"):
-        app_server_version = subprocess.check_output(['viur', '--version']).decode("utf-8")
-        click.echo(f"{valid_icon} {app_server_version}")
-    else:
-        click.echo(f"{failed_icon} ViUR-CLI")
-
-    # app_server
-    if shutil.which("app_server"):
-        app_server_version = subprocess.check_output(['app_server', '-V']).decode("utf-8")
-        click.echo(f"{valid_icon} {app_server_version}")
-    else:
-        click.echo(f"{failed_icon} app_server")
-
-    # git
-    if shutil.which("git"):
-        git_version = subprocess.check_output(['git', '--version']).decode("utf-8")
-        click.echo(f"{valid_icon} {git_version}")
-    else:
-        click.echo(f"{failed_icon}")
-
-    # python3
-    if shutil.which("python3"):
-        npm_version = subprocess.check_output(['python3', '-V']).decode("utf-8")
-        click.echo(f"{valid_icon} python3 > {npm_version}")
-    else:
-        click.echo(f"{failed_icon}")
-
-    # python
-    if shutil.which("python"):
-        npm_version = subprocess.check_output(['python', '-V']).decode("utf-8")
-        click.echo(f"{valid_icon} python > {npm_version}")
-    else:
-        click.echo(f"{failed_icon}")
-
-    # python3
-    if shutil.which("pyenv"):
-        pyenv_version = subprocess.check_output(['pyenv', '--version']).decode("utf-8")
-        click.echo(f"{valid_icon} {pyenv_version}")
-    else:
-        click.echo(f"{failed_icon}")
-
-    # npm
-    if shutil.which("npm"):
-        npm_version = subprocess.check_output(['npm', '-v']).decode("utf-8")
-        click.echo(f"{valid_icon} npm {npm_version}")
-    else:
-        click.echo(f"{failed_icon} npm")
-
-    # node
-    if shutil.which("node"):
-        npm_version = subprocess.check_output(['node', '-v']).decode("utf-8")
-        click.echo(f"{valid_icon} node {npm_version}")
-    else:
-        click.echo(f"{failed_icon} node")
-
-    # pnpm
-    if shutil.which("pnpm"):
-        npm_version = subprocess.check_output(['pnpm', '-v']).decode("utf-8")
-        click.echo(f"{valid_icon} pnpm {npm_version}")
-    else:
-        click.echo(f"{failed_icon} pnpm (optional)")
-
-    # gcloud
-    if shutil.which("gcloud"):
-        gcloud_version = subprocess.check_output(['gcloud', '-v']).decode("utf-8").split("\n\n")[0]
-        versionList = []
-        for line in gcloud_version.split("\n"):
-            if not line:
-                continue
-            if not line.startswith("Google Cloud SDK"):
-                line = " - " + line
-            versionList.append(line)
-        versionString = '\n'.join(versionList)
-        click.echo(f"{valid_icon} {versionString}")
-    else:
-        click.echo(f"{failed_icon} gcloud")
+    # Probe all tools in parallel, but report them in this order
+    probes = [
+        # (binary, arguments, output format, label when missing)
+        ("viur", ["--version"], "{}", "ViUR-CLI"),
+        ("app_server", ["-V"], "{}", "app_server"),
+        ("git", ["--version"], "{}", "git"),
+        ("python3", ["-V"], "python3 > {}", "python3"),
+        ("python", ["-V"], "python > {}", "python"),
+        ("pyenv", ["--version"], "{}", "pyenv"),
+        ("npm", ["-v"], "npm {}", "npm"),
+        ("node", ["-v"], "node {}", "node"),
+        ("pnpm", ["-v"], "pnpm {}", "pnpm (optional)"),
+        ("gcloud", ["-v"], "{}", "gcloud"),
+    ]
+
+    available = [probe for probe in probes if shutil.which(probe[0])]
+    results = dict(zip(
+        (probe[0] for probe in available),
+        executor.run(
+            executor.Process([binary, *args], name=binary, echo=False, timeout=60)
+            for binary, args, _, _ in available
+        )
+    ))
+
+    for binary, _, output_format, label in probes:
+        if not (result := results.get(binary)) or not result.ok:
+            click.echo(f"{failed_icon} {label}")
+            continue
+
+        output = result.output
+
+        if binary == "gcloud":
+            versionList = []
+            for line in output.split("\n\n")[0].split("\n"):
+                if not line:
+                    continue
+                if not line.startswith("Google Cloud SDK"):
+                    line = " - " + line
+                versionList.append(line)
+            output = '\n'.join(versionList)
+
+        click.echo(f"{valid_icon} {output_format.format(output)}")
 
     click.echo(f"\nYour default gcloud user Info:\n--------------------------------")
     for k, v in get_user_info().items():
@@ -188,26 +153,14 @@ def do_checks(dev=True):
     """
     all_checks_passed = True
 
-    def show_output_if_not(args, check_str):
-        try:
-            result = subprocess.check_output(args, stderr=subprocess.STDOUT, encoding="utf-8")
-        except subprocess.CalledProcessError as err:
-            result = err.output.strip()
-
-        if check_str not in result:
-            print(result)
-            return True
-
-        return False
+    # All checks are independent, so they run in parallel; each is a process and the string its output must contain
+    checks = []
 
     # Check Pipenv vulnerabilities
-
-    if show_output_if_not("pipenv check --output minimal".split(), "0 vulnerabilities found"):
-        all_checks_passed = False
+    checks.append(("pipenv check --output minimal".split(), "0 vulnerabilities found"))
 
     if dev:
-        if show_output_if_not("pipenv check --output minimal --categories develop".split(), "0 vulnerabilities found"):
-            all_checks_passed = False
+        checks.append(("pipenv check --output minimal --categories develop".split(), "0 vulnerabilities found"))
 
     # Check npm vulnerabilities for all npm builds
     cfg = config.get_profile("default")
@@ -217,11 +170,28 @@ def do_checks(dev=True):
                 path = os.path.join(cfg["sources_folder"], builds_cfg[name]["source"])
 
                 if dev:
-                    args = ("npm", "audit", "--prefix", path)
+                    args = ["npm", "audit", "--prefix", path]
                 else:
-                    args = ("npm", "audit", "--omit", "dev", "--prefix", path)
+                    args = ["npm", "audit", "--omit", "dev", "--prefix", path]
+
+                checks.append((args, "found 0 vulnerabilities"))
 
-                if show_output_if_not(args, "found 0 vulnerabilities"):
-                    all_checks_passed = False
+        # Check pnpm vulnerabilities for all pnpm builds
+        for name in [k for k, v in builds_cfg.items() if v["kind"] == "pnpm"]:
+            path = os.path.join(cfg["sources_folder"], builds_cfg[name]["source"])
+
+            if dev:
+                args = ["pnpm", "audit", "--dir", path]
+            else:
+                args = ["pnpm", "audit", "--prod", "--dir", path]
+
+            checks.append((args, "No known vulnerabilities found"))
+
+    results = executor.run(executor.Process(args, echo=False) for args, _ in checks)
+
+    for (_, check_str), result in zip(checks, results):
+        if check_str not in result.output:
+            print(result.output.strip())
+            all_checks_passed = False
 
     return all_checks_passed
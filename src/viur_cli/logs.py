@@ -0,0 +1,196 @@
+"""
+Multiplexes the output of concurrently running steps, like builds or deployments.
+
+Every output line is printed with the name of its step as prefix, and written to a log file per step inside the
+project, keeping the logs of previous runs. On a terminal, a status line below the output shows the running steps.
+"""
+
+import os
+import shutil
+import sys
+import threading
+import time
+import click
+
+LOGS_FOLDER = os.path.join(".viur", "logs")
+"""
+Folder of the log files, relative to the project root.
+"""
+
+KEEP_LOGS = 5
+"""
+Number of log files kept per step, including the current one.
+"""
+
+STATUS_INTERVAL = 1.0
+"""
+Seconds between updates of the status line.
+"""
+
+PREFIX_COLORS = ("cyan", "magenta", "yellow", "blue", "green", "bright_cyan", "bright_magenta", "bright_yellow")
+
+_multiplexer = None
+"""
+The active multiplexer, if any.
+"""
+
+
+def echo(message):
+    """
+    Prints a message, keeping the status line of an active multiplexer intact.
+    """
+    if _multiplexer:
+        _multiplexer.echo(message)
+    else:
+        click.echo(message)
+
+
+def prefix(name, colors):
+    """
+    Returns the colored prefix for the output lines of a step; `colors` remembers the color assigned to each name.
+    """
+    color = colors.setdefault(name, PREFIX_COLORS[len(colors) % len(PREFIX_COLORS)])
+    return click.style(f"[{name}] ", fg=color)
+
+
+def rotate(path, keep=KEEP_LOGS):
+    """
+    Renames path to path.1, path.1 to path.2 and so on, dropping files beyond `keep`.
+    """
+    for index in range(keep - 1, 0, -1):
+        if os.path.exists(older := f"{path}.{index}"):
+            if index + 1 < keep:
+                os.replace(older, f"{path}.{index + 1}")
+            else:
+                os.unlink(older)
+
+    if os.path.exists(path):
+        if keep > 1:
+            os.replace(path, f"{path}.1")
+        else:
+            os.unlink(path)
+
+
+class LogMultiplexer:
+    """
+    Collects output lines of named steps; use it as context manager around the steps.
+
+    The log files are written to `LOGS_FOLDER`/`group`/`name`.log.
+    """
+
+    def __init__(self, group, folder=None, keep=KEEP_LOGS, status=None):
+        self.folder = folder or os.path.join(LOGS_FOLDER, group)
+        self.keep = keep
+        self.status = sys.stdout.isatty() if status is None else status
+        self.files = {}
+        self.colors = {}
+        self.running = {}
+        self.status_shown = False
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.ticker = None
+
+    def __enter__(self):
+        global _multiplexer
+        _multiplexer = self
+
+        if self.status:
+            self.ticker = threading.Thread(target=self.tick, daemon=True)
+            self.ticker.start()
+
+        return self
+
+    def __exit__(self, *exc):
+        global _multiplexer
+        _multiplexer = None
+
+        self.stopped.set()
+        if self.ticker:
+            self.ticker.join()
+
+        with self.lock:
+            self.clear_status()
+
+            for f in self.files.values():
+                f.close()
+
+            self.files.clear()
+
+    def log_path(self, name):
+        return os.path.join(self.folder, name.replace(os.sep, "_") + ".log")
+
+    def log_file(self, name):
+        if (f := self.files.get(name)) is None:
+            path = self.log_path(name)
+            os.makedirs(self.folder, exist_ok=True)
+            rotate(path, self.keep)
+
+            f = self.files[name] = open(path, "w", encoding="utf-8", errors="replace")
+
+        return f
+
+    def prefix(self, name):
+        return prefix(name, self.colors)
+
+    def start(self, name, command=None):
+        """
+        Marks a step as running, and writes the command into its log.
+        """
+        with self.lock:
+            self.running.setdefault(name, time.monotonic())
+
+            if command:
+                self.log_file(name).write(f"$ {command}\n")
+
+            self.draw_status()
+
+    def finish(self, name, exit_code=None):
+        with self.lock:
+            self.running.pop(name, None)
+
+            if exit_code is not None:
+                (f := self.log_file(name)).write(f"[exit code {exit_code}]\n")
+                f.flush()
+
+            self.draw_status()
+
+    def line(self, name, line, echo=True):
+        """
+        Writes an output line of a step to its log, and prints it prefixed by the name of the step.
+        """
+        with self.lock:
+            self.log_file(name).write(line)
+
+            if echo:
+                self.echo(self.prefix(name) + line.rstrip("\n"))
+
+    def echo(self, message):
+        with self.lock:
+            self.clear_status()
+            click.echo(message)
+            self.draw_status()
+
+    def clear_status(self):
+        if self.status_shown:
+            click.echo("\r\x1b[K", nl=False)
+            self.status_shown = False
+
+    def draw_status(self):
+        if not self.status or not self.running:
+            self.clear_status()
+            return
+
+        now = time.monotonic()
+        text = "running: " + ", ".join(f"{name} ({now - start:.0f}s)" for name, start in self.running.items())
+        width = shutil.get_terminal_size().columns - 1
+
+        if len(text) > width:
+            text = text[:max(width - 3, 0)] + "..."
+
+        click.echo("\r\x1b[K" + click.style(text, dim=True), nl=False)
+        self.status_shown = True
+
+    def tick(self):
+        while not self.stopped.wait(STATUS_INTERVAL):
+            with self.lock:
+                self.draw_status()
@@ -0,0 +1,138 @@
+"""
+Profiling of a single viur invocation, enabled by the global `--profile-run` option.
+"""
+
+import collections
+import cProfile
+import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+from .utils import echo_info
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def default_output():
+    return f"""viur-profile-{datetime.datetime.now().strftime("%Y%m%d-%H%M%S")}.pstats"""
+
+
+class StackProfiler:
+    """
+    Records the time spent in every distinct call stack, which is written in the speedscope format.
+
+    Unlike cProfile, which only keeps caller/callee pairs, this keeps complete stacks, so flame graphs are exact.
+    """
+
+    def __init__(self):
+        self.frames = {}
+        self.weights = collections.defaultdict(float)
+        self.stack = []
+        self.last = time.perf_counter()
+
+    def frame_index(self, key):
+        if (index := self.frames.get(key)) is None:
+            index = self.frames[key] = len(self.frames)
+
+        return index
+
+    def trace(self, frame, event, arg):
+        now = time.perf_counter()
+
+        if self.stack:
+            self.weights[tuple(self.stack)] += now - self.last
+
+        if event == "call":
+            code = frame.f_code
+            self.stack.append(self.frame_index((code.co_qualname, code.co_filename, code.co_firstlineno)))
+        elif event == "c_call":
+            self.stack.append(self.frame_index((f"{getattr(arg, '__module__', None) or 'builtins'}.{arg.__qualname__}",
+                                                None, None)))
+        elif self.stack:
+            # return, c_return or c_exception
+            self.stack.pop()
+
+        self.last = time.perf_counter()
+
+    def enable(self):
+        sys.setprofile(self.trace)
+
+    def disable(self):
+        sys.setprofile(None)
+
+    def dump_stats(self, path):
+        frames = [
+            {"name": name} | ({"file": file, "line": line} if file else {})
+            for (name, file, line), _ in sorted(self.frames.items(), key=lambda item: item[1])
+        ]
+
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "$schema": "https://www.speedscope.app/file-format-schema.json",
+                    "shared": {"frames": frames},
+                    "profiles": [
+                        {
+                            "type": "sampled",
+                            "name": " ".join(sys.argv),
+                            "unit": "seconds",
+                            "startValue": 0,
+                            "endValue": sum(self.weights.values()),
+                            "samples": [list(stack) for stack in self.weights],
+                            "weights": list(self.weights.values()),
+                        }
+                    ],
+                },
+                f
+            )
+
+
+class RunProfiler:
+    """
+    Profiles the invoked command with cProfile (or a stack profiler for speedscope output) and tracemalloc.
+
+    Both profilers measure wall-clock time, so time blocked in `utils.system()`, `cloud.run_command()`,
+    `os.system()` or any other subprocess call shows up in the calling function.
+    The output format is chosen by the file name: "*.json" is written for speedscope, anything else as pstats.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.speedscope = self.path.endswith(".json")
+        self.profiler = StackProfiler() if self.speedscope else cProfile.Profile()
+        self.start_time = None
+        self.start_children = None
+
+    def start(self):
+        tracemalloc.start()
+        self.start_time = time.perf_counter()
+        self.start_children = self.children_cpu_time()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        duration = time.perf_counter() - self.start_time
+        children = self.children_cpu_time() - self.start_children
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.profiler.dump_stats(self.path)
+
+        echo_info(
+            f"Profile written to {self.path}\n"
+            f"  wall time: {duration:.2f}s, subprocess cpu time: {children:.2f}s, "
+            f"peak python memory: {peak / 1024 / 1024:.1f} MiB"
+        )
+
+    @staticmethod
+    def children_cpu_time():
+        if resource is None:
+            return 0.0
+
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
@@ -1,7 +1,6 @@
 import click
-import os
 
-from . import cli
+from . import cli, executor
 
 
 @cli.group()
@@ -25,12 +24,10 @@ def tool():
 @click.option('--package', '-p')
 @click.option('--target', '-t')
 @click.option('--help', '-h')
-def pyodide(additional_args, version, package, target, help):
+def pyodide(version, package, target, help):
     """
     The 'pyodide' command allows you to run the 'get_pyodide' command for Pyodide installation.
 
-    :param additional_args: tuple
-        Additional arguments to pass to the 'get_pyodide' command.
     :param version: str, optional
         Specify the version of Pyodide.
     :param package: str, optional
@@ -47,20 +44,20 @@ def pyodide(additional_args, version, package, target, help):
 
     :return: None
     """
-    command = "get-pyodide"
+    command = ["get-pyodide"]
     if help:
-        os.system("get-pyodide -h")
+        executor.run_process(["get-pyodide", "-h"], capture=False)
 
     if version:
-        command += f" -v {version}"
+        command += ["-v", version]
 
     if package:
-        command += f" -p {package}"
+        command += ["-p", package]
 
     if target:
-        command += f" -t {target}"
+        command += ["-t", target]
 
-    os.system(command)
+    executor.run_process(command, capture=False)
 
 
 @tool.command()
@@ -77,4 +74,5 @@ def ssl_fix():
 
     :return: None
     """
-    os.system("chmod +x scripts/macos_certificate_fix.command && ./scripts/macos_certificate_fix.command")
+    executor.run_process("chmod +x scripts/macos_certificate_fix.command && ./scripts/macos_certificate_fix.command",
+                         capture=False)
@@ -0,0 +1,233 @@
+"""
+Records timing spans of external processes and network requests, enabled by the global `--timings` option.
+
+The spans are written as a Chrome trace (open it in chrome://tracing, Perfetto or speedscope),
+and summarized on the console when the command finishes.
+"""
+
+import contextlib
+import datetime
+import functools
+import json
+import os
+import subprocess
+import threading
+import time
+import urllib.request
+from .utils import echo_info
+
+_tracer = None
+"""
+The active tracer, if any.
+"""
+
+
+def default_output():
+    return f"""viur-timings-{datetime.datetime.now().strftime("%Y%m%d-%H%M%S")}.json"""
+
+
+class Span:
+    """
+    A single timed operation; finishing it records a complete event in the trace.
+    """
+
+    def __init__(self, tracer, name, category, **args):
+        self.tracer = tracer
+        self.event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": tracer.now(),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        self.finished = False
+
+    def finish(self, **args):
+        if self.finished:
+            return
+
+        self.finished = True
+        self.event["dur"] = self.tracer.now() - self.event["ts"]
+        self.event["args"].update(args)
+        self.tracer.record(self.event)
+
+
+@contextlib.contextmanager
+def span(name, category="viur", **args):
+    """
+    Times the enclosed block as a span, when tracing is enabled.
+    """
+    if not _tracer:
+        yield None
+        return
+
+    current = Span(_tracer, name, category, **args)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(error=repr(e))
+        raise
+    finally:
+        current.finish()
+
+
+class Tracer:
+    """
+    Collects spans of every subprocess (including `os.system()`) and HTTP request made via requests or urllib.
+
+    The hooks are installed by wrapping the respective library functions, and removed again by `uninstall()`.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+        self.patches = []
+
+    def now(self):
+        return int((time.perf_counter() - self.origin) * 1_000_000)
+
+    def record(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def patch(self, owner, name, factory):
+        original = getattr(owner, name)
+        self.patches.append((owner, name, original))
+        setattr(owner, name, functools.wraps(original)(factory(original)))
+
+    def install(self):
+        global _tracer
+        _tracer = self
+
+        tracer = self
+
+        def popen_init(original):
+            def wrapper(popen, args, *a, **kw):
+                popen._viur_span = Span(tracer, command_name(args), "process", command=str(args))
+                try:
+                    original(popen, args, *a, **kw)
+                except BaseException as e:
+                    popen._viur_span.finish(error=repr(e))
+                    raise
+
+            return wrapper
+
+        def popen_wait(original):
+            def wrapper(popen, *a, **kw):
+                ret = original(popen, *a, **kw)
+                if current := getattr(popen, "_viur_span", None):
+                    current.finish(exit_code=ret)
+                return ret
+
+            return wrapper
+
+        def popen_communicate(original):
+            def wrapper(popen, *a, **kw):
+                stdout, stderr = original(popen, *a, **kw)
+                if current := getattr(popen, "_viur_span", None):
+                    current.event["args"]["bytes"] = len(stdout or "") + len(stderr or "")
+                return stdout, stderr
+
+            return wrapper
+
+        def os_system(original):
+            def wrapper(command):
+                with span(command_name(command), "process", command=command) as current:
+                    ret = original(command)
+                    current.event["args"]["exit_code"] = os.waitstatus_to_exitcode(ret) if os.name == "posix" else ret
+                    return ret
+
+            return wrapper
+
+        def urllib_open(original):
+            def wrapper(opener, fullurl, *a, **kw):
+                url = getattr(fullurl, "full_url", fullurl)
+                current = Span(tracer, f"GET {url}", "http", url=url)
+
+                try:
+                    response = original(opener, fullurl, *a, **kw)
+                except BaseException as e:
+                    current.finish(error=repr(e))
+                    raise
+
+                # The body is usually read after urlopen() returned, so the span ends when the response is closed
+                received = [0]
+                read, close = response.read, response.close
+
+                def traced_read(*args, **kwargs):
+                    data = read(*args, **kwargs)
+                    received[0] += len(data)
+                    return data
+
+                def traced_close():
+                    current.finish(status=response.status, bytes=received[0])
+                    close()
+
+                response.read, response.close = traced_read, traced_close
+                return response
+
+            return wrapper
+
+        self.patch(subprocess.Popen, "__init__", popen_init)
+        self.patch(subprocess.Popen, "wait", popen_wait)
+        self.patch(subprocess.Popen, "communicate", popen_communicate)
+        self.patch(os, "system", os_system)
+        self.patch(urllib.request.OpenerDirector, "open", urllib_open)
+
+        try:
+            import requests
+        except ImportError:
+            pass
+        else:
+            def requests_send(original):
+                def wrapper(session, request, **kw):
+                    with span(f"{request.method} {request.url}", "http", url=request.url) as current:
+                        response = original(session, request, **kw)
+                        current.event["args"]["status"] = response.status_code
+                        if not kw.get("stream"):
+                            current.event["args"]["bytes"] = len(response.content)
+                        return response
+
+                return wrapper
+
+            self.patch(requests.Session, "send", requests_send)
+
+    def uninstall(self):
+        global _tracer
+
+        for owner, name, original in reversed(self.patches):
+            setattr(owner, name, original)
+
+        self.patches.clear()
+        _tracer = None
+
+    def stop(self):
+        """
+        Removes the hooks, writes the trace file and prints the slowest spans.
+        """
+        self.uninstall()
+
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+        echo_info(f"Timings written to {self.path}")
+
+        for event in sorted(self.events, key=lambda e: e["dur"], reverse=True)[:10]:
+            details = ", ".join(f"{k}={v}" for k, v in event["args"].items() if k not in ("command", "url"))
+            echo_info(f"""  {event["dur"] / 1_000_000:8.2f}s  {event["cat"]:<8} {event["name"]}"""
+                      + (f" ({details})" if details else ""))
+
+
+def command_name(command, length=80):
+    """
+    Returns a short, single-line name for a command given as string or argument list.
+    """
+    if not isinstance(command, str):
+        command = " ".join(str(arg) for arg in command)
+
+    command = " ".join(command.split())
+    return command if len(command) <= length else command[:length - 3] + "..."
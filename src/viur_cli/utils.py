@@ -6,6 +6,19 @@ import typing
 import datetime
 import getpass
 import subprocess
+import uuid
+from . import logs
+
+TRASH_FOLDER = os.path.join(".viur", "trash")
+"""
+Folder inside the project, where `trash()` moves folders to until they are deleted.
+"""
+
+EMPTY_TRASH_SCRIPT = """
+import concurrent.futures, shutil, sys
+with concurrent.futures.ThreadPoolExecutor() as pool:
+    list(pool.map(lambda path: shutil.rmtree(path, ignore_errors=True), sys.argv[1:]))
+"""
 
 
 def rmdir(dir):
@@ -27,25 +40,89 @@ def rmdir(dir):
         pass
 
 
-def system(cmd):
-    """Performs an os.system() call with the given command, but throws an echo_fatal on error and stops viur-cli."""
-    if os.system(cmd) != 0:
+def trash(dir):
+    """Moves a folder out of the way into the trash folder of the project, to be deleted later by `empty_trash()`.
+
+    Renaming is atomic and instant even for huge folders like node_modules. Like `rmdir()`, it only allows folders
+    inside the project folder; folders on another file system are removed right away.
+    """
+    dir = os.path.abspath(dir)
+    wdir = os.getcwd()
+    if wdir != os.path.commonpath((wdir, dir)):
+        echo_fatal(f"Illegal path configuration, won't remove {dir!r}")
+
+    if not os.path.lexists(dir):
+        return
+
+    trash_dir = os.path.join(wdir, TRASH_FOLDER)
+    os.makedirs(trash_dir, exist_ok=True)
+
+    try:
+        os.rename(dir, os.path.join(trash_dir, f"{os.path.basename(dir)}.{uuid.uuid4().hex}"))
+    except OSError:
+        rmdir(dir)
+
+
+def empty_trash(wait=False):
+    """Deletes all folders in the trash folder of the project, in parallel.
+
+    Unless `wait` is set, this happens in a detached background process, so the caller doesn't have to wait for it.
+    Folders left over by an interrupted deletion are picked up again by the next call.
+    """
+    trash_dir = os.path.join(os.getcwd(), TRASH_FOLDER)
+
+    try:
+        paths = [os.path.join(trash_dir, name) for name in os.listdir(trash_dir)]
+    except FileNotFoundError:
+        return
+
+    if not paths:
+        return
+
+    process = subprocess.Popen(
+        [sys.executable, "-c", EMPTY_TRASH_SCRIPT, *paths],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        # Survives the end of viur-cli, and a Ctrl-C in the terminal
+        start_new_session=not wait,
+    )
+
+    if wait:
+        process.wait()
+
+
+def cache_dir(*path):
+    """Returns a folder inside the user's viur-cli cache directory, which is created when not existing yet.
+
+    The cache directory respects $XDG_CACHE_HOME and defaults to ~/.cache/viur-cli.
+    """
+    folder = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "viur-cli", *path)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def system(cmd, cwd=None):
+    """Runs the given command attached to the terminal, but throws an echo_fatal on error and stops viur-cli."""
+    from .executor import run_process
+
+    if not run_process(cmd, cwd=cwd, capture=False).ok:
         echo_fatal(f"Failed to execute {cmd!r}")
 
 
 def echo_error(msg):
     """colored cli feedback for error messages"""
-    click.echo(click.style("ERROR: " + msg, fg="red"))
+    logs.echo(click.style("ERROR: " + msg, fg="red"))
 
 
 def echo_success(msg):
     """colored cli feedback for success messages"""
-    click.echo(click.style("SUCCESS: " + msg, fg="green"))
+    logs.echo(click.style("SUCCESS: " + msg, fg="green"))
 
 
 def echo_warning(msg):
     """colored cli feedback for warnings"""
-    click.echo(click.style("WARNING: " + msg, fg=(255, 231, 0)))
+    logs.echo(click.style("WARNING: " + msg, fg=(255, 231, 0)))
 
 
 def echo_fatal(msg):
@@ -55,7 +132,7 @@ def echo_fatal(msg):
 
 def echo_info(msg):
     """colored cli feedback for information"""
-    click.echo(click.style(msg, fg="cyan"))
+    logs.echo(click.style(msg, fg="cyan"))
 
 
 def replace_vars(string: str, vars: typing.Optional[typing.Dict[str, str]] = None) -> str:
@@ -102,6 +179,27 @@ def replace_vars(string: str, vars: typing.Optional[typing.Dict[str, str]] = Non
     return string
 
 
+def deep_merge(base: dict, override: dict) -> dict:
+    """Recursively merges the override dict into a copy of the base dict.
+
+    Nested dicts are merged key by key, any other value in override replaces the one in base.
+    A value of None in override removes the key from the result.
+    """
+    ret = {k: deep_merge({}, v) if isinstance(v, dict) else v for k, v in base.items()}
+
+    for key, value in override.items():
+        if value is None:
+            ret.pop(key, None)
+        elif isinstance(value, dict) and isinstance(ret.get(key), dict):
+            ret[key] = deep_merge(ret[key], value)
+        elif isinstance(value, dict):
+            ret[key] = deep_merge({}, value)
+        else:
+            ret[key] = value
+
+    return ret
+
+
 def requirements_to_dict(requirements):
     ret = {}
     for requirement in requirements:
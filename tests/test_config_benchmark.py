@@ -0,0 +1,70 @@
+import json
+import time
+
+import pytest
+
+from viur_cli.conf import ProjectConfig
+from viur_cli.version import __version__ as cli_version
+
+PROFILES = 500
+ROUNDS = 5
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A current project.json with many profiles, each with its own builds"""
+    config = {
+        "cli-version": cli_version,
+        "format": ProjectConfig.VERSION,
+        "default": {
+            "application_name": "benchmark",
+            "version": "1",
+            "builds": {
+                "admin": {"command": "viur package install admin", "kind": "exec", "version": "4.0.0"},
+            },
+        },
+    }
+
+    for i in range(PROFILES):
+        config[f"profile{i}"] = {
+            "application_name": f"benchmark-{i}",
+            "builds": {
+                f"app{j}": {"kind": "npm", "source": f"sources/app{j}", "target": f"deploy/static/app{j}"}
+                for j in range(10)
+            },
+        }
+
+    (tmp_path / ProjectConfig.FILENAME).write_text(json.dumps(config, indent=4))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def load_time(migrations, monkeypatch):
+    """Best-of load time for a ProjectConfig with the given number of registered migration steps"""
+    registry = dict(ProjectConfig.MIGRATIONS)
+
+    def step(config):
+        raise AssertionError("a migration step ran on a current project.json")
+
+    # Pad the registry with steps from older formats, chaining into the oldest real one
+    for i in range(migrations - len(registry)):
+        registry[f"0.0.{i}"] = step
+
+    monkeypatch.setattr(ProjectConfig, "MIGRATIONS", registry)
+    monkeypatch.setattr(ProjectConfig, "normalize", step)
+
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        ProjectConfig()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def test_load_time_independent_of_migrations(project, monkeypatch):
+    few = load_time(5, monkeypatch)
+    many = load_time(5000, monkeypatch)
+    print(f"\n{PROFILES} profiles: {few * 1000:.1f}ms with 5 migrations, {many * 1000:.1f}ms with 5000")
+
+    assert many < few * 1.5 + 0.005
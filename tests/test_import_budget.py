@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+# Everything `viur --version` may import on top of a bare interpreter and the standard library
+ALLOWED_MODULES = {
+    "viur_cli",
+    "viur_cli.__main__",
+    "viur_cli.cli",
+    "viur_cli.conf",
+    "viur_cli.logs",
+    "viur_cli.utils",
+    "viur_cli.version",
+}
+ALLOWED_PACKAGES = {"click"}
+
+LIST_MODULES = "import json, sys; print(json.dumps(sorted(sys.modules)))"
+RUN_VERSION = """
+import json, sys
+sys.argv = ["viur", "--version"]
+import viur_cli
+try:
+    viur_cli.main()
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def imported_modules(code):
+    env = dict(os.environ)
+    env.pop("VIUR_DAEMON", None)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_version_import_budget():
+    modules = imported_modules(RUN_VERSION) - imported_modules(LIST_MODULES)
+    unexpected = sorted(
+        name for name in modules
+        if name.partition(".")[0] not in sys.stdlib_module_names | ALLOWED_PACKAGES
+        and name not in ALLOWED_MODULES
+    )
+    assert not unexpected, f"viur --version imports more than it needs: {', '.join(unexpected)}"